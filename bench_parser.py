@@ -0,0 +1,94 @@
+# Micro-benchmark for the station table parser.
+#
+# Usage: python bench_parser.py [captured_page.html ...]
+# Without arguments a synthetic station page is used.
+import sys
+import timeit
+
+from station_parser import parse_station_html
+
+
+# The split/re-slice parser that fetch_table_data used before station_parser
+def legacy_parse(html):
+    if "Invalid Range" in html:
+        return None, "Invalid station ID - station does not exist"
+
+    table_start = html.find('<table')
+    table_end = html.find('</table>') + len('</table>')
+    if table_start == -1 or table_end == -1:
+        return None, "Table not found in HTML"
+
+    table_html = html[table_start:table_end]
+    rows = [
+        row.strip() for row in table_html.split('<tr>')[1:]
+        if '</tr>' in row
+    ]
+    table_data = []
+
+    for row in rows:
+        cells = [
+            cell.strip() for cell in row.split('<td>')[1:]
+            if '</td>' in cell
+        ]
+        if len(cells) >= 2:
+            key = cells[0].split('</td>')[0].replace(
+                '<span class="style46">', '').replace('</span>', '').strip()
+            value = cells[1].split('</td>')[0]
+            while '<' in value and '>' in value:
+                start = value.find('<')
+                end = value.find('>', start) + 1
+                if end == 0:
+                    break
+                value = value[:start] + value[end:]
+            value = value.strip()
+
+            if key.lower() in ['latitude', 'longitude']:
+                continue
+
+            table_data.append((key, value))
+
+    return table_data, None
+
+
+# A station page shaped like the upstream one, with heavily tagged values
+def synthetic_page(rows=20, tags_per_value=40):
+    fields = [
+        "AWS Location", "Mandal", "Date & Time", "Last Updated",
+        "Rainfall (mm)", "Temperature", "Humidity", "Wind Speed", "Pressure",
+        "Latitude", "Longitude"
+    ]
+    markup = '<font color="#003366"><b>' * tags_per_value
+    closing = '</b></font>' * tags_per_value
+    body = []
+    for i in range(rows):
+        key = fields[i % len(fields)]
+        body.append(f'<tr><td><span class="style46">{key}</span></td>'
+                    f'<td>{markup}{i}.5{closing}</td></tr>')
+    head = '<html><head><style>' + 'td{padding:2px}' * 200 + '</style></head>'
+    return (head + '<body><table border="1">' + ''.join(body) +
+            '</table>' + '<p>footer</p>' * 200 + '</body></html>')
+
+
+def bench(name, html, number=200):
+    legacy = legacy_parse(html)
+    current = parse_station_html(html)
+    if legacy != current:
+        print(f"{name}: results differ\n  legacy:  {legacy}\n  current: {current}")
+
+    legacy_time = timeit.timeit(lambda: legacy_parse(html), number=number)
+    current_time = timeit.timeit(lambda: parse_station_html(html),
+                                 number=number)
+    print(f"{name}: legacy {legacy_time / number * 1e6:.1f}us, "
+          f"station_parser {current_time / number * 1e6:.1f}us, "
+          f"speedup {legacy_time / current_time:.1f}x")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        for path in sys.argv[1:]:
+            with open(path, encoding="utf-8", errors="replace") as f:
+                bench(path, f.read())
+    else:
+        bench("synthetic (20 rows, 40 tags/value)", synthetic_page())
+        bench("synthetic (20 rows, 200 tags/value)",
+              synthetic_page(tags_per_value=200), number=50)
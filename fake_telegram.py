@@ -0,0 +1,158 @@
+# Local stand-in for the Telegram Bot API, for trying the bot end to end.
+#
+# Usage: python fake_telegram.py [--port 8081] [--chat 1]
+#                                [--webhook URL --secret SECRET]
+#
+# Start the bot with TELEGRAM_API_URL=http://localhost:8081, and for webhook
+# mode also BOT_MODE=webhook WEBHOOK_URL=http://localhost:3026
+# WEBHOOK_SECRET=<secret>. Lines typed on stdin (e.g. "/rf") are delivered
+# to the bot as messages from --chat: POSTed to the webhook when --webhook is
+# given, otherwise served through getUpdates. Everything the bot sends is
+# printed.
+import argparse
+import itertools
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+import requests
+
+_update_ids = itertools.count(1)
+_message_ids = itertools.count(1)
+_updates = []
+_updates_cond = threading.Condition()
+
+
+def message_json(chat_id, text, message_id=None):
+    chat_id = int(chat_id)
+    return {
+        'message_id': message_id or next(_message_ids),
+        'date': int(time.time()),
+        'chat': {
+            'id': chat_id,
+            'type': 'private'
+        },
+        'from': {
+            'id': chat_id,
+            'is_bot': False,
+            'first_name': 'Tester'
+        },
+        'text': text
+    }
+
+
+# An incoming message update, with the command entity Telegram would add
+def update_json(chat_id, text):
+    message = message_json(chat_id, text)
+    if text.startswith('/'):
+        command = text.split()[0]
+        message['entities'] = [{
+            'type': 'bot_command',
+            'offset': 0,
+            'length': len(command)
+        }]
+    return {'update_id': next(_update_ids), 'message': message}
+
+
+# Bot API methods the bot uses; anything else just succeeds
+def call_method(method, params):
+    if method == 'getMe':
+        return {
+            'id': 1,
+            'is_bot': True,
+            'first_name': 'FakeBot',
+            'username': 'fake_bot'
+        }
+    if method == 'getUpdates':
+        offset = int(params.get('offset', 0) or 0)
+        timeout = min(float(params.get('timeout', 0) or 0), 20)
+        deadline = time.monotonic() + timeout
+        with _updates_cond:
+            _updates[:] = [u for u in _updates if u['update_id'] >= offset]
+            while not _updates and time.monotonic() < deadline:
+                _updates_cond.wait(deadline - time.monotonic())
+            return list(_updates)
+    if method in ('sendMessage', 'editMessageText'):
+        print(f"<- {method} to {params.get('chat_id')}:\n{params.get('text')}\n")
+        message_id = params.get('message_id')
+        return message_json(params.get('chat_id', 0), params.get('text', ''),
+                            int(message_id) if message_id else None)
+    if method == 'sendDocument':
+        print(f"<- sendDocument to {params.get('chat_id')}\n")
+        message = message_json(params.get('chat_id', 0), '')
+        del message['text']
+        message['document'] = {'file_id': 'fake', 'file_unique_id': 'fake'}
+        return message
+    if method not in ('setWebhook', 'deleteWebhook'):
+        print(f"<- {method} {params}\n")
+    return True
+
+
+class BotApiHandler(BaseHTTPRequestHandler):
+
+    def _params(self):
+        params = dict(parse_qsl(urlparse(self.path).query))
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        content_type = self.headers.get('Content-Type', '')
+        if content_type.startswith('application/json'):
+            params.update(json.loads(body or b'{}'))
+        elif content_type.startswith('application/x-www-form-urlencoded'):
+            params.update(parse_qsl(body.decode('utf-8')))
+        return params
+
+    def _handle(self):
+        # /bot<token>/<method>
+        method = urlparse(self.path).path.rstrip('/').rsplit('/', 1)[-1]
+        result = call_method(method, self._params())
+        data = json.dumps({'ok': True, 'result': result}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = _handle
+    do_POST = _handle
+
+    def log_message(self, format, *args):
+        pass
+
+
+# Deliver a message from the test chat to the bot
+def deliver(text, chat_id, webhook=None, secret=None):
+    update = update_json(chat_id, text)
+    if webhook:
+        response = requests.post(
+            f"{webhook.rstrip('/')}/webhook/{secret}",
+            json=update,
+            headers={'X-Telegram-Bot-Api-Secret-Token': secret},
+            timeout=10)
+        if response.status_code != 200:
+            print(f"!! webhook returned {response.status_code}")
+    else:
+        with _updates_cond:
+            _updates.append(update)
+            _updates_cond.notify_all()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--chat', default='1')
+    parser.add_argument('--webhook')
+    parser.add_argument('--secret')
+    args = parser.parse_args()
+    if args.webhook and not args.secret:
+        parser.error('--webhook needs --secret')
+
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), BotApiHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Fake Bot API on http://127.0.0.1:{args.port}, chat {args.chat}")
+    for line in sys.stdin:
+        line = line.strip()
+        if line:
+            deliver(line, args.chat, args.webhook, args.secret)
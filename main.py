@@ -1,19 +1,60 @@
 import os
+import codecs
 import requests
 import telebot
+from telebot.apihelper import ApiTelegramException
 from datetime import timezone, timedelta
 import time
 import threading
+import queue
+import socket
+import signal
 from requests.exceptions import RequestException, ProxyError, ConnectTimeout
 from datetime import datetime, timedelta
 from uuid import uuid4
 import re
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError
+import heapq
+import zlib
+import itertools
+from collections import OrderedDict
+from concurrent.futures import (Future, ThreadPoolExecutor, as_completed,
+                                wait as wait_futures)
+from contextlib import contextmanager
+from functools import partial
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+from pymongo import (MongoClient, ReturnDocument, UpdateOne, DeleteOne,
+                     DeleteMany)
+from pymongo.errors import (ConnectionFailure, ServerSelectionTimeoutError,
+                            DuplicateKeyError, PyMongoError)
+import metrics
+from webserver import (keep_alive, register_health_provider,
+                       register_webhook_handler)
+from station_parser import (INVALID_STATION_ERROR, StationPageReader,
+                            parse_station_html, table_fingerprint)
 
 # Telegram bot token (replace with your bot token)
 BOT_TOKEN = os.environ.get('BOT_TOKEN')
-bot = telebot.TeleBot(BOT_TOKEN)
+
+# Point the bot at another Bot API server, e.g. fake_telegram.py for testing
+TELEGRAM_API_URL = os.environ.get('TELEGRAM_API_URL')
+if TELEGRAM_API_URL:
+    telebot.apihelper.API_URL = TELEGRAM_API_URL.rstrip('/') + '/bot{0}/{1}'
+
+# "polling" (default) or "webhook". In webhook mode Telegram POSTs updates to
+# WEBHOOK_URL/webhook/WEBHOOK_SECRET on the keep-alive web server and
+# WEBHOOK_WORKERS threads run the handlers.
+BOT_MODE = os.environ.get('BOT_MODE', 'polling').lower()
+WEBHOOK_URL = os.environ.get('WEBHOOK_URL')
+WEBHOOK_SECRET = os.environ.get('WEBHOOK_SECRET')
+WEBHOOK_WORKERS = int(os.environ.get('WEBHOOK_WORKERS', '4'))
+if BOT_MODE == 'webhook' and not (WEBHOOK_URL and WEBHOOK_SECRET):
+    raise ValueError(
+        "WEBHOOK_URL and WEBHOOK_SECRET are required when BOT_MODE=webhook")
+
+# Webhook updates run on webhook_executor, so handlers are called inline there
+# instead of going through telebot's own thread pool
+bot = telebot.TeleBot(BOT_TOKEN, threaded=BOT_MODE != 'webhook')
 
 # MongoDB connection
 MONGO_URI = os.environ.get('MONGO_URI')
@@ -49,77 +90,333 @@ URL_PREFIX = os.environ.get('URL_PREFIX')
 # Maximum subscriptions per user
 MAX_SUBSCRIPTIONS_PER_USER = 4
 
+# Follow subscription changes made by other processes (needs a replica set)
+SUBSCRIPTION_WATCH = os.environ.get('SUBSCRIPTION_WATCH', '').lower() in (
+    '1', 'true', 'yes')
+
+# Minutes past the hour (Indian time) at which automatic updates run,
+# e.g. AUTO_UPDATE_MINUTES="7,37" for two updates an hour
+AUTO_UPDATE_MINUTES = sorted({
+    int(m) % 60
+    for m in os.environ.get('AUTO_UPDATE_MINUTES', '7').split(',')
+    if m.strip()
+})
+
+# While waiting for the next run the scheduler wakes this often (seconds) to
+# record a heartbeat and renew its shard leases
+SCHEDULER_HEARTBEAT_INTERVAL = 60
+
+# The scheduler is reported unhealthy if it has not ticked for this long
+SCHEDULER_STALE_AFTER = 180
+
+# Each station gets a fixed delivery offset within this many seconds after
+# the trigger (by hash of its ID), spreading fetches and sends over the
+# window instead of one burst. 0 releases every station at the trigger time.
+BROADCAST_WINDOW = int(os.environ.get('BROADCAST_WINDOW', '600'))
+
+# The scheduled cycle is split by station into this many shards. Every
+# scheduler process claims a fair share of them through MongoDB leases, so
+# several replicas can run without sending an update twice.
+SCHEDULER_SHARDS = max(int(os.environ.get('SCHEDULER_SHARDS', '4')), 1)
+SCHEDULER_LEASE_TTL = int(os.environ.get('SCHEDULER_LEASE_TTL', '300'))
+
+# "all" answers commands and runs the scheduler, "scheduler" only runs the
+# scheduler and "bot" only answers commands
+WORKER_ROLE = os.environ.get('WORKER_ROLE', 'all').lower()
+if WORKER_ROLE not in ('all', 'scheduler', 'bot'):
+    raise ValueError("WORKER_ROLE must be one of: all, scheduler, bot")
+
+# Port of the keep-alive web server (/health, /metrics and the webhook).
+# Every worker process on a host needs its own.
+WEB_PORT = int(os.environ.get('WEB_PORT') or os.environ.get('PORT') or '3026')
+
+# Stable across restarts, so a restarted worker takes back its own leases
+# instead of waiting for them to expire. The default includes WEB_PORT, which
+# already has to differ between workers on the same host.
+WORKER_ID = os.environ.get('WORKER_ID') or (
+    f"{socket.gethostname()}-{WORKER_ROLE}-{WEB_PORT}")
+
+# A run that was missed (e.g. an earlier cycle overran) is still started if
+# it is at most this many seconds late, otherwise it is skipped
+SCHEDULER_MISSED_GRACE = 300
+
+# How often (seconds) to check whether another process changed the proxy config
+PROXY_VERSION_POLL_INTERVAL = int(
+    os.environ.get('PROXY_VERSION_POLL_INTERVAL', '30'))
+
+# Proxy failures are written to MongoDB at most this often (seconds), and
+# owner alerts outside the hourly cycle are sent as a digest at most this often
+PROXY_FAILURE_FLUSH_INTERVAL = int(
+    os.environ.get('PROXY_FAILURE_FLUSH_INTERVAL', '10'))
+PROXY_ALERT_INTERVAL = int(os.environ.get('PROXY_ALERT_INTERVAL', '600'))
+
+# Per-proxy circuit breaker: open after this many consecutive failures and
+# retry with exponential backoff between the base and max delay (seconds)
+PROXY_BREAKER_THRESHOLD = int(os.environ.get('PROXY_BREAKER_THRESHOLD', '3'))
+PROXY_BREAKER_BASE_DELAY = int(os.environ.get('PROXY_BREAKER_BASE_DELAY', '60'))
+PROXY_BREAKER_MAX_DELAY = int(os.environ.get('PROXY_BREAKER_MAX_DELAY', '3600'))
+
+# Background proxy health probing (interval in seconds, 0 disables it)
+PROXY_PROBE_INTERVAL = int(os.environ.get('PROXY_PROBE_INTERVAL', '300'))
+PROXY_PROBE_URL = os.environ.get('PROXY_PROBE_URL',
+                                 'http://www.gstatic.com/generate_204')
+PROXY_PROBE_WORKERS = 16
+
+# Timeout in seconds for a single upstream request
+FETCH_TIMEOUT = 10
+
+# Concurrent fetch engine limits
+FETCH_MAX_WORKERS = int(os.environ.get('FETCH_MAX_WORKERS', '8'))
+FETCH_PER_HOST_LIMIT = int(os.environ.get('FETCH_PER_HOST_LIMIT', '4'))
+FETCH_PER_PROXY_LIMIT = int(os.environ.get('FETCH_PER_PROXY_LIMIT', '2'))
+
+# Keep-alive HTTP session pool per route (proxy or direct)
+SESSION_POOL_CONNECTIONS = int(os.environ.get('SESSION_POOL_CONNECTIONS', '4'))
+SESSION_POOL_MAXSIZE = int(os.environ.get('SESSION_POOL_MAXSIZE', '8'))
+SESSION_IDLE_TIMEOUT = int(os.environ.get('SESSION_IDLE_TIMEOUT', '900'))
+
+# Stream station pages and stop reading at the first </table>
+STREAMING_FETCH = os.environ.get('STREAMING_FETCH', '1').lower() in ('1', 'true',
+                                                                    'yes')
+STREAM_CHUNK_SIZE = 8192
+# After the table, read up to this many more bytes in the background so the
+# connection goes back to the keep-alive pool; longer remainders are dropped
+# with the socket. Proxy traffic is metered, so by default those routes never
+# download the tail.
+STREAM_DRAIN_LIMIT = int(os.environ.get('STREAM_DRAIN_LIMIT', str(4 * 1024)))
+STREAM_PROXY_DRAIN_LIMIT = int(os.environ.get('STREAM_PROXY_DRAIN_LIMIT', '0'))
+
+# Parsed station readings are reused for this many seconds (stations update hourly)
+STATION_CACHE_TTL = int(os.environ.get('STATION_CACHE_TTL', '900'))
+STATION_CACHE_SIZE = int(os.environ.get('STATION_CACHE_SIZE', '1000'))
+
+# Proxy scoreboard smoothing and persistence interval (seconds)
+PROXY_EWMA_ALPHA = float(os.environ.get('PROXY_EWMA_ALPHA', '0.3'))
+PROXY_SCOREBOARD_PERSIST_INTERVAL = int(
+    os.environ.get('PROXY_SCOREBOARD_PERSIST_INTERVAL', '300'))
+# Proxies that failed this recently are tried later
+PROXY_FAILURE_COOLDOWN = 300
+
+# Race manual /rf fetches across the best proxies (opt-in)
+HEDGED_MANUAL_FETCH = os.environ.get('HEDGED_MANUAL_FETCH', '').lower() in (
+    '1', 'true', 'yes')
+HEDGE_FANOUT = min(max(int(os.environ.get('HEDGE_FANOUT', '2')), 1), 3)
+HEDGE_INCLUDE_DIRECT = os.environ.get('HEDGE_INCLUDE_DIRECT', '').lower() in (
+    '1', 'true', 'yes')
+
+# Outbound Telegram dispatcher: global and per-chat send rates (messages per
+# second), worker threads, and how often a 429 response is retried
+TELEGRAM_GLOBAL_RATE = float(os.environ.get('TELEGRAM_GLOBAL_RATE', '30'))
+TELEGRAM_PER_CHAT_RATE = float(os.environ.get('TELEGRAM_PER_CHAT_RATE', '1'))
+TELEGRAM_SEND_WORKERS = int(os.environ.get('TELEGRAM_SEND_WORKERS', '4'))
+TELEGRAM_MAX_RETRIES = 3
+
+# Slow commands (/rf, /subscribe) run as background jobs: worker threads and
+# the most jobs that may be queued or running at once
+COMMAND_WORKERS = int(os.environ.get('COMMAND_WORKERS', '4'))
+COMMAND_QUEUE_SIZE = int(os.environ.get('COMMAND_QUEUE_SIZE', '100'))
+
 # Indian timezone (UTC+5:30)
 INDIAN_TIMEZONE = timezone(timedelta(hours=5, minutes=30))
 
+# Log rotation: logs.txt is rotated into logs.txt.1 ... logs.txt.N once it
+# reaches MAX_LOG_LINES lines or MAX_LOG_BYTES bytes
 MAX_LOG_LINES = 4000
-# Enhanced logging function with error handling
-def write_log(level, message):
-    try:
-        # Use Indian timezone for timestamp
+MAX_LOG_BYTES = int(os.environ.get('MAX_LOG_BYTES', str(1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.environ.get('LOG_BACKUP_COUNT', '2'))
+
+# Asynchronous log pipeline: callers enqueue, a writer thread batches to disk
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', '10000'))
+LOG_BATCH_SIZE = 500
+LOG_FLUSH_INTERVAL = 1.0
+
+_log_lock = threading.Lock()
+_log_handle = None
+_log_line_count = 0
+_log_byte_count = 0
+
+
+def _open_log_file():
+    global _log_handle, _log_line_count, _log_byte_count
+    _log_line_count = 0
+    if os.path.exists(LOG_FILE):
+        # Count existing lines once, when the file is first opened
+        with open(LOG_FILE, "rb") as f:
+            for _ in f:
+                _log_line_count += 1
+    _log_handle = open(LOG_FILE, "a", encoding="utf-8")
+    _log_byte_count = _log_handle.tell()
+
+
+def _close_log_file():
+    global _log_handle
+    if _log_handle:
+        _log_handle.close()
+        _log_handle = None
+
+
+def _rotate_log_files():
+    _close_log_file()
+    for i in range(LOG_BACKUP_COUNT - 1, 0, -1):
+        source = f"{LOG_FILE}.{i}"
+        if os.path.exists(source):
+            os.replace(source, f"{LOG_FILE}.{i + 1}")
+    if LOG_BACKUP_COUNT > 0:
+        os.replace(LOG_FILE, f"{LOG_FILE}.1")
+    else:
+        os.remove(LOG_FILE)
+    _open_log_file()
+
+
+# Append formatted log lines, rotating first if the segment is full.
+# Callers must hold _log_lock.
+def _append_log_lines(lines):
+    global _log_line_count, _log_byte_count
+    if _log_handle is None:
+        _open_log_file()
+
+    data = ''.join(lines)
+    size = len(data.encode('utf-8'))
+    if _log_line_count and (_log_line_count + len(lines) > MAX_LOG_LINES
+                            or _log_byte_count + size > MAX_LOG_BYTES):
+        _rotate_log_files()
+
+    _log_handle.write(data)
+    _log_handle.flush()
+    _log_line_count += len(lines)
+    _log_byte_count += size
+
+
+_log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+_log_writer_lock = threading.Lock()
+_log_writer_thread = None
+_log_writer_stopped = False
+_log_dropped = 0
+_log_dropped_total = 0
+
+
+def _write_log_batch(batch):
+    global _log_dropped
+    with _log_writer_lock:
+        dropped, _log_dropped = _log_dropped, 0
+    if dropped:
         timestamp = datetime.now(INDIAN_TIMEZONE).strftime("%Y-%m-%d %H:%M:%S IST")
-        log_entry = f"{timestamp} - {level.upper()} - {message}\n"
-
-        lines = []
-        if os.path.exists(LOG_FILE):
-            with open(LOG_FILE, "r", encoding="utf-8") as f:
-                lines = f.readlines()
+        batch.append(
+            f"{timestamp} - WARNING - Log queue full, dropped {dropped} record(s)\n"
+        )
+    try:
+        with _log_lock:
+            _append_log_lines(batch)
+    except Exception as e:
+        print(f"LOG ERROR: {e} | Lost {len(batch)} log line(s)")
 
-        # Append the new log entry
-        lines.append(log_entry)
 
-        # Keep only the last MAX_LOG_LINES lines
-        if len(lines) > MAX_LOG_LINES:
-            lines = lines[-MAX_LOG_LINES:]
+# Drain the queue, flushing when the batch is full or the interval elapses.
+# A None record stops the writer after flushing everything queued before it.
+def _log_writer_loop():
+    while True:
+        record = _log_queue.get()
+        if record is None:
+            break
+        batch = [record]
+        deadline = time.monotonic() + LOG_FLUSH_INTERVAL
+        stop = False
+        while len(batch) < LOG_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                record = _log_queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if record is None:
+                stop = True
+                break
+            batch.append(record)
+        _write_log_batch(batch)
+        if stop:
+            break
 
-        with open(LOG_FILE, "w", encoding="utf-8") as f:
-            f.writelines(lines)
+    # Anything enqueued after the stop marker
+    batch = []
+    while True:
+        try:
+            record = _log_queue.get_nowait()
+        except queue.Empty:
+            break
+        if record is not None:
+            batch.append(record)
+    if batch:
+        _write_log_batch(batch)
+
+
+def _ensure_log_writer():
+    global _log_writer_thread
+    if _log_writer_thread is not None and not _log_writer_stopped:
+        return True
+    with _log_writer_lock:
+        if _log_writer_stopped:
+            return False
+        if _log_writer_thread is None:
+            _log_writer_thread = threading.Thread(target=_log_writer_loop,
+                                                  name="log-writer",
+                                                  daemon=True)
+            _log_writer_thread.start()
+    return True
+
+
+# Flush queued records and stop the writer; later logs are written inline
+def stop_log_writer(timeout=5):
+    global _log_writer_stopped
+    with _log_writer_lock:
+        _log_writer_stopped = True
+        thread = _log_writer_thread
+    if thread is None:
+        return
+    try:
+        _log_queue.put(None, timeout=timeout)
+    except queue.Full:
+        pass
+    thread.join(timeout)
 
-    except Exception as e:
-        print(f"LOG ERROR: {e} | Original message: {level.upper()} - {message}")
 
+def log_pipeline_stats():
+    with _log_writer_lock:
+        return {
+            'queued': _log_queue.qsize(),
+            'dropped': _log_dropped_total
+        }
 
 
-# Function to delete previous checking time log and append new one at the end
-def replace_last_checking_log(message):
+# Enhanced logging function with error handling
+def write_log(level, message):
+    global _log_dropped, _log_dropped_total
     try:
+        # Use Indian timezone for timestamp
         timestamp = datetime.now(INDIAN_TIMEZONE).strftime("%Y-%m-%d %H:%M:%S IST")
-        new_log_line = f"{timestamp} - INFO - {message}\n"
-        
-        # Read all existing logs
-        if os.path.exists(LOG_FILE):
-            with open(LOG_FILE, "r", encoding='utf-8') as f:
-                lines = f.readlines()
-            
-            # Remove the last "Checking Indian time" log if it exists
-            for i in range(len(lines) - 1, -1, -1):
-                if "Checking Indian time:" in lines[i]:
-                    lines.pop(i)  # Delete the line
-                    break
-            
-            # Append new checking time log at the end
-            lines.append(new_log_line)
-            
-            # Write back to file
-            with open(LOG_FILE, "w", encoding='utf-8') as f:
-                f.writelines(lines)
+        log_entry = f"{timestamp} - {level.upper()} - {message}\n"
+
+        if _ensure_log_writer():
+            _log_queue.put_nowait(log_entry)
         else:
-            # If log file doesn't exist, create it with the new log
-            with open(LOG_FILE, "w", encoding='utf-8') as f:
-                f.write(new_log_line)
-                
+            with _log_lock:
+                _append_log_lines([log_entry])
+
+    except queue.Full:
+        with _log_writer_lock:
+            _log_dropped += 1
+            _log_dropped_total += 1
     except Exception as e:
-        # Fallback to regular logging if replacement fails
-        write_log("INFO", message)
-        print(f"LOG REPLACE ERROR: {e}")
+        print(f"LOG ERROR: {e} | Original message: {level.upper()} - {message}")
+
 
 
-# Load subscriptions from MongoDB
+# Load subscriptions from MongoDB; returns None when they cannot be read
 def load_subscriptions():
     try:
         if db is None:
             write_log("ERROR", "MongoDB not initialized")
-            return {}
+            return None
         
         subscriptions = {}
         cursor = db.subscriptions.find()
@@ -134,82 +431,502 @@ def load_subscriptions():
         return subscriptions
     except Exception as e:
         write_log("ERROR", f"Error loading subscriptions from MongoDB: {e}")
-        return {}
+        return None
 
 
+# Batch upsert of the given chats in one bulk_write; chats with an empty
+# list are removed and chats not in the mapping are left untouched
 def save_subscriptions(subscriptions):
     try:
         if db is None:
             write_log("ERROR", "MongoDB not initialized")
             return
-        
-        # Clear existing subscriptions
-        db.subscriptions.delete_many({})
-        
-        # Insert new subscriptions
+
+        now = datetime.now(INDIAN_TIMEZONE)
+        operations = []
         for chat_id, suffixes in subscriptions.items():
-            if suffixes:  # Only save if user has subscriptions
-                db.subscriptions.insert_one({
-                    'chat_id': chat_id,
-                    'suffixes': suffixes,
-                    'updated_at': datetime.now(INDIAN_TIMEZONE)
-                })
-        
+            if isinstance(suffixes, str):
+                suffixes = [suffixes]
+            if suffixes:
+                operations.append(
+                    UpdateOne({'chat_id': chat_id}, {
+                        '$set': {
+                            'suffixes': suffixes,
+                            'updated_at': now
+                        }
+                    },
+                              upsert=True))
+            else:
+                operations.append(DeleteOne({'chat_id': chat_id}))
+
+        if operations:
+            db.subscriptions.bulk_write(operations, ordered=False)
+
         write_log("INFO", "Subscriptions saved to MongoDB successfully")
     except Exception as e:
         write_log("ERROR", f"Error saving subscriptions to MongoDB: {e}")
 
 
-# Load proxies from MongoDB
-def load_proxies():
+# Fold duplicate documents of a chat into its first one. The old
+# wipe-and-reinsert save could leave several, which blocks the unique index.
+def merge_duplicate_subscriptions():
+    documents = {}
+    for doc in db.subscriptions.find({}, {'chat_id': 1, 'suffixes': 1}):
+        documents.setdefault(doc['chat_id'], []).append(doc)
+
+    operations = []
+    for chat_id, docs in documents.items():
+        if len(docs) < 2:
+            continue
+        merged = []
+        for doc in docs:
+            suffixes = doc.get('suffixes', [])
+            if isinstance(suffixes, str):
+                suffixes = [suffixes]
+            merged.extend(s for s in suffixes if s not in merged)
+        keep_id = docs[0]['_id']
+        operations.append(
+            UpdateOne({'_id': keep_id}, {
+                '$set': {
+                    'suffixes': merged,
+                    'updated_at': datetime.now(INDIAN_TIMEZONE)
+                }
+            }))
+        operations.append(
+            DeleteMany({
+                'chat_id': chat_id,
+                '_id': {
+                    '$ne': keep_id
+                }
+            }))
+
+    if operations:
+        db.subscriptions.bulk_write(operations)
+        write_log(
+            "INFO",
+            f"Merged duplicate subscription documents for {len(operations) // 2} chat(s)")
+
+
+# Convert old string-format subscriptions and enforce one document per chat.
+# Returns False when the unique chat_id index cannot be created, since
+# add_subscription relies on it.
+def prepare_subscriptions_collection():
     try:
         if db is None:
             write_log("ERROR", "MongoDB not initialized")
-            return {"proxies": [], "failed": []}
-        
-        # Get proxies document
-        proxies_doc = db.proxies.find_one({'_id': 'proxy_config'})
-        if proxies_doc:
+            return False
+
+        old_format = {
+            doc['chat_id']: doc['suffixes']
+            for doc in db.subscriptions.find({'suffixes': {
+                '$type': 'string'
+            }})
+        }
+        if old_format:
+            save_subscriptions(old_format)
+            write_log(
+                "INFO",
+                f"Migrated {len(old_format)} subscription(s) to list format")
+
+        merge_duplicate_subscriptions()
+        db.subscriptions.create_index('chat_id', unique=True)
+        return True
+    except Exception as e:
+        write_log("ERROR", f"Error preparing subscriptions collection: {e}")
+        return False
+
+
+# Atomically add a station to a chat's subscriptions. The limit and
+# duplicate checks are part of the query, so concurrent commands cannot
+# overshoot MAX_SUBSCRIPTIONS_PER_USER.
+# Returns (status, suffixes) where status is "added", "exists" or "limit".
+def add_subscription(chat_id, suffix):
+    for attempt in range(2):
+        doc = db.subscriptions.find_one_and_update(
+            {
+                'chat_id': chat_id,
+                'suffixes': {
+                    '$ne': suffix
+                },
+                f'suffixes.{MAX_SUBSCRIPTIONS_PER_USER - 1}': {
+                    '$exists': False
+                }
+            }, {
+                '$addToSet': {
+                    'suffixes': suffix
+                },
+                '$set': {
+                    'updated_at': datetime.now(INDIAN_TIMEZONE)
+                }
+            },
+            return_document=ReturnDocument.AFTER)
+        if doc is not None:
+            return "added", doc.get('suffixes', [])
+
+        # First subscription of the chat. Matching on chat_id alone never
+        # adds a second document next to an existing one.
+        try:
+            result = db.subscriptions.update_one({'chat_id': chat_id}, {
+                '$setOnInsert': {
+                    'suffixes': [suffix],
+                    'updated_at': datetime.now(INDIAN_TIMEZONE)
+                }
+            },
+                                                 upsert=True)
+        except DuplicateKeyError:
+            # A concurrent first subscription won; retry against its document
+            continue
+        if result.upserted_id is not None:
+            return "added", [suffix]
+        # The chat exists: full, already subscribed, or created concurrently
+        # since the first query, in which case the retry can still add
+
+    doc = db.subscriptions.find_one({'chat_id': chat_id}) or {}
+    suffixes = doc.get('suffixes', [])
+    if suffix in suffixes:
+        return "exists", suffixes
+    return "limit", suffixes
+
+
+# Atomically remove a station from a chat's subscriptions.
+# Returns the remaining suffixes, or None if the chat was not subscribed.
+def remove_subscription(chat_id, suffix):
+    doc = db.subscriptions.find_one_and_update(
+        {
+            'chat_id': chat_id,
+            'suffixes': suffix
+        }, {
+            '$pull': {
+                'suffixes': suffix
+            },
+            '$set': {
+                'updated_at': datetime.now(INDIAN_TIMEZONE)
+            }
+        },
+        return_document=ReturnDocument.AFTER)
+    if doc is None:
+        return None
+
+    remaining = doc.get('suffixes', [])
+    if not remaining:
+        # Only delete if nothing was added in the meantime
+        db.subscriptions.delete_one({
+            'chat_id': chat_id,
+            'suffixes': {
+                '$size': 0
+            }
+        })
+    return remaining
+
+
+# Process-resident subscriptions: chat -> stations and station -> chats.
+# Loaded once at startup, written through to MongoDB on every change.
+class SubscriptionStore:
+
+    def __init__(self):
+        self._by_chat = {}
+        self._by_station = {}
+        self._changes = 0
+        self._lock = threading.Lock()
+
+    # Replace the maps with a MongoDB snapshot. A snapshot read while a local
+    # change was applied may predate it, so it is dropped and read again.
+    def load(self):
+        for attempt in range(3):
+            with self._lock:
+                changes = self._changes
+            subscriptions = load_subscriptions()
+            if subscriptions is None:
+                # Keep serving the last known subscriptions
+                write_log("WARNING",
+                          "Keeping the previous subscriptions in memory")
+                return
+            with self._lock:
+                if self._changes != changes:
+                    continue
+                self._by_chat = {}
+                self._by_station = {}
+                for chat_id, suffixes in subscriptions.items():
+                    self._set_chat(chat_id, suffixes)
+            write_log(
+                "INFO",
+                f"Loaded {len(subscriptions)} subscriber(s) into memory")
+            return
+        write_log("WARNING",
+                  "Subscriptions kept changing during reload, keeping the current ones")
+
+    refresh = load
+
+    # Replace one chat's stations in both maps; callers hold the lock
+    def _set_chat(self, chat_id, suffixes):
+        for suffix in self._by_chat.pop(chat_id, []):
+            chats = self._by_station.get(suffix)
+            if chats is not None:
+                chats.discard(chat_id)
+                if not chats:
+                    del self._by_station[suffix]
+        if suffixes:
+            self._by_chat[chat_id] = list(suffixes)
+            for suffix in suffixes:
+                self._by_station.setdefault(suffix, set()).add(chat_id)
+
+    def get(self, chat_id):
+        with self._lock:
+            return list(self._by_chat.get(chat_id, []))
+
+    def station_index(self):
+        with self._lock:
             return {
-                'proxies': proxies_doc.get('proxies', []),
-                'failed': proxies_doc.get('failed', [])
+                suffix: sorted(chats)
+                for suffix, chats in self._by_station.items()
             }
+
+    def counts(self):
+        with self._lock:
+            return len(self._by_chat), len(self._by_station)
+
+    def add(self, chat_id, suffix):
+        status, suffixes = add_subscription(chat_id, suffix)
+        with self._lock:
+            self._changes += 1
+            self._set_chat(chat_id, suffixes)
+        return status, suffixes
+
+    def remove(self, chat_id, suffix):
+        remaining = remove_subscription(chat_id, suffix)
+        if remaining is not None:
+            with self._lock:
+                self._changes += 1
+                self._set_chat(chat_id, remaining)
+        return remaining
+
+    # Apply one change stream event
+    def apply_change(self, change):
+        document = change.get('fullDocument')
+        if change.get('operationType') in ('insert', 'update',
+                                           'replace') and document:
+            suffixes = document.get('suffixes', [])
+            if isinstance(suffixes, str):
+                suffixes = [suffixes]
+            with self._lock:
+                self._changes += 1
+                self._set_chat(document['chat_id'], suffixes)
         else:
-            # Create default document if it doesn't exist
-            default_config = {"proxies": [], "failed": []}
-            db.proxies.insert_one({
-                '_id': 'proxy_config',
-                'proxies': [],
-                'failed': [],
-                'updated_at': datetime.now(INDIAN_TIMEZONE)
-            })
-            return default_config
+            # Deletes only carry the document _id, so reload everything
+            self.refresh()
+
+
+subscription_store = SubscriptionStore()
+
+
+# Keep the store in sync with writes made by other bot processes
+def watch_subscription_changes():
+    while True:
+        try:
+            with db.subscriptions.watch(
+                    full_document='updateLookup') as stream:
+                write_log("INFO", "Watching subscription changes")
+                # Catch up on anything missed while the stream was down
+                subscription_store.refresh()
+                for change in stream:
+                    subscription_store.apply_change(change)
+        except PyMongoError as e:
+            write_log("ERROR", f"Subscription change stream failed: {e}")
+            time.sleep(30)
+
+
+# In-memory copy of the proxy_config document and its version counter
+_proxy_config = None
+_proxy_config_checked = 0.0
+_proxy_config_lock = threading.Lock()
+
+
+def _copy_proxy_config(config):
+    return {
+        'proxies': list(config['proxies']),
+        'failed': list(config['failed'])
+    }
+
+
+def _cache_proxy_config(proxies, failed, version):
+    global _proxy_config, _proxy_config_checked
+    with _proxy_config_lock:
+        _proxy_config = {
+            'proxies': list(proxies),
+            'failed': list(failed),
+            'version': version
+        }
+        _proxy_config_checked = time.monotonic()
+
+
+# Read the proxy_config document from MongoDB, creating it if missing
+def _read_proxy_config():
+    proxies_doc = db.proxies.find_one({'_id': 'proxy_config'})
+    if proxies_doc:
+        return (proxies_doc.get('proxies', []), proxies_doc.get('failed', []),
+                proxies_doc.get('version', 0))
+
+    # Create default document if it doesn't exist
+    db.proxies.insert_one({
+        '_id': 'proxy_config',
+        'proxies': [],
+        'failed': [],
+        'version': 0,
+        'updated_at': datetime.now(INDIAN_TIMEZONE)
+    })
+    return [], [], 0
+
+
+# Load proxies, served from memory; MongoDB is only asked for the version
+# number every PROXY_VERSION_POLL_INTERVAL seconds
+def load_proxies():
+    global _proxy_config_checked
+    try:
+        if db is None:
+            write_log("ERROR", "MongoDB not initialized")
+            return {"proxies": [], "failed": []}
+
+        with _proxy_config_lock:
+            cached = _proxy_config
+            fresh = time.monotonic(
+            ) - _proxy_config_checked < PROXY_VERSION_POLL_INTERVAL
+            if cached is not None and fresh:
+                return _copy_proxy_config(cached)
+
+        if cached is not None:
+            doc = db.proxies.find_one({'_id': 'proxy_config'}, {'version': 1})
+            if doc and doc.get('version', 0) == cached['version']:
+                with _proxy_config_lock:
+                    _proxy_config_checked = time.monotonic()
+                return _copy_proxy_config(cached)
+
+        proxies, failed, version = _read_proxy_config()
+        _cache_proxy_config(proxies, failed, version)
+        if cached is not None:
+            write_log("INFO", f"Proxy configuration reloaded (version {version})")
+        return {'proxies': list(proxies), 'failed': list(failed)}
     except Exception as e:
         write_log("ERROR", f"Error loading proxies from MongoDB: {e}")
         return {"proxies": [], "failed": []}
 
 
-def save_proxies(proxies_data):
+# Apply one atomic update to the proxy configuration and bump its version
+# for other processes. Single-entry $addToSet/$pull updates leave concurrent
+# changes to other entries intact. Returns the updated configuration, or
+# None on failure.
+def update_proxy_config(update):
     try:
         if db is None:
             write_log("ERROR", "MongoDB not initialized")
-            return
-        
-        # Update or insert proxies configuration
-        db.proxies.replace_one(
+            return None
+
+        update = dict(update)
+        update['$set'] = {'updated_at': datetime.now(INDIAN_TIMEZONE)}
+        update['$inc'] = {'version': 1}
+        doc = db.proxies.find_one_and_update(
             {'_id': 'proxy_config'},
-            {
-                '_id': 'proxy_config',
-                'proxies': proxies_data.get('proxies', []),
-                'failed': proxies_data.get('failed', []),
-                'updated_at': datetime.now(INDIAN_TIMEZONE)
-            },
-            upsert=True
-        )
-        
+            update,
+            upsert=True,
+            return_document=ReturnDocument.AFTER)
+        proxies = doc.get('proxies', [])
+        failed = doc.get('failed', [])
+        _cache_proxy_config(proxies, failed, doc.get('version', 0))
+
         write_log("INFO", "Proxies saved to MongoDB successfully")
+        return {'proxies': list(proxies), 'failed': list(failed)}
     except Exception as e:
         write_log("ERROR", f"Error saving proxies to MongoDB: {e}")
+        return None
+
+
+# Last delivered content fingerprint per station, mirrored in MongoDB
+station_fingerprints = {}
+station_fingerprints_lock = threading.Lock()
+
+
+# Load every stored fingerprint, or reload only the given stations
+def load_station_fingerprints(suffixes=None):
+    try:
+        if db is None:
+            write_log("ERROR", "MongoDB not initialized")
+            return
+        query = {} if suffixes is None else {'_id': {'$in': list(suffixes)}}
+        loaded = {
+            doc['_id']: doc.get('fingerprint')
+            for doc in db.station_state.find(query, {'fingerprint': 1})
+        }
+        with station_fingerprints_lock:
+            for suffix in suffixes or ():
+                if suffix not in loaded:
+                    station_fingerprints.pop(suffix, None)
+            station_fingerprints.update(loaded)
+        if suffixes is None:
+            write_log(
+                "INFO",
+                f"Loaded fingerprints for {len(station_fingerprints)} station(s)")
+    except Exception as e:
+        write_log("ERROR", f"Error loading station fingerprints: {e}")
+
+
+# Store a station's fingerprint; returns True when the content changed
+def update_station_fingerprint(suffix, fingerprint):
+    with station_fingerprints_lock:
+        if station_fingerprints.get(suffix) == fingerprint:
+            return False
+        station_fingerprints[suffix] = fingerprint
+    try:
+        if db is not None:
+            db.station_state.update_one({'_id': suffix}, {
+                '$set': {
+                    'fingerprint': fingerprint,
+                    'updated_at': datetime.now(INDIAN_TIMEZONE)
+                }
+            },
+                                        upsert=True)
+    except Exception as e:
+        write_log("ERROR",
+                  f"Error saving fingerprint for station {suffix}: {e}")
+    return True
+
+
+# Chats that only want scheduled updates when the reading changed
+only_changed_chats = set()
+
+
+def load_user_settings():
+    try:
+        if db is None:
+            write_log("ERROR", "MongoDB not initialized")
+            return
+        enabled = {
+            doc['chat_id']
+            for doc in db.user_settings.find({'only_changed': True})
+        }
+        # Also drops chats that turned the setting off in another process
+        only_changed_chats.intersection_update(enabled)
+        only_changed_chats.update(enabled)
+    except Exception as e:
+        write_log("ERROR", f"Error loading user settings from MongoDB: {e}")
+
+
+def save_only_changed(chat_id, enabled):
+    if enabled:
+        only_changed_chats.add(chat_id)
+    else:
+        only_changed_chats.discard(chat_id)
+    try:
+        if db is None:
+            write_log("ERROR", "MongoDB not initialized")
+            return
+        db.user_settings.update_one({'chat_id': chat_id}, {
+            '$set': {
+                'only_changed': enabled,
+                'updated_at': datetime.now(INDIAN_TIMEZONE)
+            }
+        },
+                                    upsert=True)
+    except Exception as e:
+        write_log("ERROR", f"Error saving user settings to MongoDB: {e}")
 
 
 # Convert 24-hour time to 12-hour AM/PM format with date
@@ -308,53 +1025,295 @@ def match_field_type(key):
     return 'other', ''
 
 
-# Fetch table data from URL with direct request (no proxy)
-def fetch_table_data_direct(url):
+# Per-host and per-proxy concurrency caps shared by all fetch workers
+_route_limits_lock = threading.Lock()
+_host_semaphores = {}
+_proxy_semaphores = {}
+
+
+def _get_route_semaphore(registry, key, limit):
+    with _route_limits_lock:
+        semaphore = registry.get(key)
+        if semaphore is None:
+            semaphore = threading.BoundedSemaphore(limit)
+            registry[key] = semaphore
+        return semaphore
+
+
+# Hold a per-proxy and a per-upstream-host slot for the duration of a request
+@contextmanager
+def route_slot(url, proxy=None):
+    host_semaphore = _get_route_semaphore(_host_semaphores,
+                                          urlparse(url).netloc,
+                                          FETCH_PER_HOST_LIMIT)
+    proxy_semaphore = None
+    if proxy:
+        proxy_semaphore = _get_route_semaphore(_proxy_semaphores, proxy,
+                                               FETCH_PER_PROXY_LIMIT)
+
+    # Always acquire proxy before host so workers cannot deadlock
+    if proxy_semaphore:
+        proxy_semaphore.acquire()
     try:
-        response = requests.get(url, timeout=10)
-        html = response.text
-
-        # Check for invalid range error
-        if "Invalid Range" in html:
-            return None, "Invalid station ID - station does not exist"
-
-        table_start = html.find('<table')
-        table_end = html.find('</table>') + len('</table>')
-        if table_start == -1 or table_end == -1:
-            return None, "Table not found in HTML"
-
-        table_html = html[table_start:table_end]
-        rows = [
-            row.strip() for row in table_html.split('<tr>')[1:]
-            if '</tr>' in row
-        ]
-        table_data = []
+        with host_semaphore:
+            yield
+    finally:
+        if proxy_semaphore:
+            proxy_semaphore.release()
+
+
+# One keep-alive requests.Session per route, evicted after sitting idle
+class SessionPool:
+
+    def __init__(self, pool_connections, pool_maxsize, idle_timeout):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.idle_timeout = idle_timeout
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+
+    def _create(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_connections,
+                              pool_maxsize=self.pool_maxsize)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    # Route is "direct" or a proxy entry such as "1.2.3.4:8080:http".
+    # Proxies are passed on each request: session-level proxies would be
+    # overridden by HTTP_PROXY/HTTPS_PROXY from the environment.
+    def get(self, route):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_sweep >= 60:
+                self._evict_idle(now)
+            entry = self._sessions.get(route)
+            if entry is None:
+                entry = [self._create(), now]
+                self._sessions[route] = entry
+            entry[1] = now
+            return entry[0]
+
+    def _evict_idle(self, now):
+        self._last_sweep = now
+        for route, (session, last_used) in list(self._sessions.items()):
+            if now - last_used >= self.idle_timeout:
+                del self._sessions[route]
+                session.close()
+
+    def discard(self, route):
+        with self._lock:
+            entry = self._sessions.pop(route, None)
+        if entry:
+            entry[0].close()
+
+    def close_all(self):
+        with self._lock:
+            sessions = [session for session, _ in self._sessions.values()]
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
+
+
+session_pool = SessionPool(SESSION_POOL_CONNECTIONS, SESSION_POOL_MAXSIZE,
+                           SESSION_IDLE_TIMEOUT)
+
+
+# ETag/Last-Modified validators and the table they describe, per URL
+_http_validators = {}
+_http_validators_lock = threading.Lock()
+
+
+def conditional_headers(url):
+    with _http_validators_lock:
+        validators = _http_validators.get(url)
+    headers = {}
+    if validators:
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+    return headers
+
+
+def remember_validators(url, response, table_data):
+    etag = response.headers.get('ETag')
+    last_modified = response.headers.get('Last-Modified')
+    if table_data and (etag or last_modified):
+        with _http_validators_lock:
+            _http_validators[url] = {
+                'etag': etag,
+                'last_modified': last_modified,
+                'table_data': table_data
+            }
 
-        for row in rows:
-            cells = [
-                cell.strip() for cell in row.split('<td>')[1:]
-                if '</td>' in cell
-            ]
-            if len(cells) >= 2:
-                key = cells[0].split('</td>')[0].replace(
-                    '<span class="style46">', '').replace('</span>',
-                                                          '').strip()
-                value = cells[1].split('</td>')[0]
-                while '<' in value and '>' in value:
-                    start = value.find('<')
-                    end = value.find('>', start) + 1
-                    if end == 0:
-                        break
-                    value = value[:start] + value[end:]
-                value = value.strip()
-
-                # Skip Latitude and Longitude entries
-                if key.lower() in ['latitude', 'longitude']:
-                    continue
 
-                table_data.append((key, value))
+# Table from the last full response, for a 304 Not Modified answer
+def not_modified_table(url):
+    with _http_validators_lock:
+        validators = _http_validators.get(url)
+    if validators:
+        return validators['table_data'], None
+    return None, "304 Not Modified without a cached page"
+
+
+# Metrics served on /metrics by the keep-alive web server
+station_fetches = metrics.counter('weather_station_fetches_total',
+                                  'Station page fetches by route and outcome',
+                                  ('route', 'outcome'))
+station_fetch_seconds = metrics.histogram(
+    'weather_station_fetch_seconds', 'Station page fetch latency', ('route', ))
+station_parse_seconds = metrics.histogram(
+    'weather_station_parse_seconds',
+    'Time spent parsing station tables',
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+             0.1))
+command_fetch_seconds = metrics.histogram(
+    'weather_command_fetch_seconds',
+    'Time to get station data for a command reply')
+telegram_send_seconds = metrics.histogram('weather_telegram_send_seconds',
+                                          'Telegram API send latency')
+telegram_messages = metrics.counter('weather_telegram_messages_total',
+                                    'Telegram messages by outcome',
+                                    ('outcome', ))
+command_wait_seconds = metrics.histogram(
+    'weather_command_queue_wait_seconds',
+    'Time command jobs wait before a worker picks them up')
+scheduler_cycles = metrics.counter('weather_scheduler_cycles_total',
+                                   'Completed automatic update cycles')
+
+
+# Record one station page fetch made through a route
+def observe_fetch(route, started, table_data, error):
+    station_fetch_seconds.observe(time.monotonic() - started, route=route)
+    if table_data:
+        outcome = 'success'
+    elif error == INVALID_STATION_ERROR:
+        outcome = 'invalid'
+    else:
+        outcome = 'error'
+    station_fetches.inc(route=route, outcome=outcome)
+
+
+# Parse with timing, returning (table_data, error)
+def timed_parse(parse, *args):
+    started = time.perf_counter()
+    try:
+        return parse(*args)
+    finally:
+        station_parse_seconds.observe(time.perf_counter() - started)
+
+
+# Finish reading a streamed body when little is left, so urllib3 can reuse
+# the connection. Closing mid-body would discard it instead.
+def drain_response(response, limit):
+    try:
+        remaining = int(response.headers['Content-Length']) - response.raw.tell()
+        if remaining > limit:
+            return False
+    except (KeyError, ValueError, TypeError):
+        pass
+    drained = 0
+    try:
+        for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+            drained += len(chunk)
+            if drained > limit:
+                return False
+    except RequestException:
+        return False
+    return True
+
+
+def _drain_and_close(response, limit):
+    try:
+        drain_response(response, limit)
+    finally:
+        response.close()
+
+
+# Page tails are drained here so the caller has its result right away
+drain_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="drain")
+
 
-        return table_data, None
+# Release a response left mid-body: drain it off the caller's thread when
+# allowed, otherwise close it and drop the connection
+def release_response(response, drain_limit):
+    if drain_limit <= 0:
+        response.close()
+        return
+    try:
+        drain_executor.submit(_drain_and_close, response, drain_limit)
+    except RuntimeError:
+        # Executor already shut down
+        response.close()
+
+
+# Download and parse a station page, returning (table_data, error)
+def request_station_page(session, url, proxies=None, drain_limit=0):
+    headers = conditional_headers(url)
+
+    if not STREAMING_FETCH:
+        response = session.get(url,
+                               headers=headers,
+                               proxies=proxies,
+                               timeout=FETCH_TIMEOUT)
+        if response.status_code == 304:
+            return not_modified_table(url)
+        table_data, error = timed_parse(parse_station_html, response.text)
+        remember_validators(url, response, table_data)
+        return table_data, error
+
+    # Stop parsing at the first </table>; the rest of the body is drained in
+    # the background if small, otherwise closing the response drops it (and
+    # the connection)
+    response = session.get(url,
+                           headers=headers,
+                           proxies=proxies,
+                           timeout=FETCH_TIMEOUT,
+                           stream=True)
+    stopped_early = False
+    try:
+        if response.status_code == 304:
+            return not_modified_table(url)
+
+        try:
+            decoder = codecs.getincrementaldecoder(response.encoding
+                                                   or 'utf-8')(errors='replace')
+        except LookupError:
+            decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+        reader = StationPageReader()
+        for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+            if reader.feed(decoder.decode(chunk)):
+                stopped_early = True
+                break
+        else:
+            reader.feed(decoder.decode(b'', final=True))
+        table_data, error = timed_parse(reader.result)
+        remember_validators(url, response, table_data)
+        return table_data, error
+    finally:
+        if stopped_early:
+            release_response(response, drain_limit)
+        else:
+            response.close()
+
+
+# Fetch table data from URL with direct request (no proxy)
+def fetch_table_data_direct(url):
+    try:
+        with route_slot(url):
+            started = time.monotonic()
+            try:
+                table_data, error = request_station_page(
+                    session_pool.get('direct'), url,
+                    drain_limit=STREAM_DRAIN_LIMIT)
+            except RequestException as e:
+                table_data, error = None, str(e)
+            observe_fetch('direct', started, table_data, error)
+            return table_data, error
     except RequestException as e:
         return None, str(e)
 
@@ -362,55 +1321,27 @@ def fetch_table_data_direct(url):
 def fetch_table_data(url, proxy, scheme):
     try:
         proxy_url = f"{scheme}://{proxy.split(':')[0]}:{proxy.split(':')[1]}"
-        response = requests.get(url,
-                                proxies={
-                                    "http": proxy_url,
-                                    "https": proxy_url
-                                },
-                                timeout=10)
-        html = response.text
-
-        # Check for invalid range error
-        if "Invalid Range" in html:
-            return None, "Invalid station ID - station does not exist"
-
-        table_start = html.find('<table')
-        table_end = html.find('</table>') + len('</table>')
-        if table_start == -1 or table_end == -1:
-            return None, "Table not found in HTML"
-
-        table_html = html[table_start:table_end]
-        rows = [
-            row.strip() for row in table_html.split('<tr>')[1:]
-            if '</tr>' in row
-        ]
-        table_data = []
-
-        for row in rows:
-            cells = [
-                cell.strip() for cell in row.split('<td>')[1:]
-                if '</td>' in cell
-            ]
-            if len(cells) >= 2:
-                key = cells[0].split('</td>')[0].replace(
-                    '<span class="style46">', '').replace('</span>',
-                                                          '').strip()
-                value = cells[1].split('</td>')[0]
-                while '<' in value and '>' in value:
-                    start = value.find('<')
-                    end = value.find('>', start) + 1
-                    if end == 0:
-                        break
-                    value = value[:start] + value[end:]
-                value = value.strip()
-
-                # Skip Latitude and Longitude entries
-                if key.lower() in ['latitude', 'longitude']:
-                    continue
-
-                table_data.append((key, value))
-
-        return table_data, None
+        route = f"{proxy}:{scheme}"
+        with route_slot(url, proxy):
+            session = session_pool.get(route)
+            started = time.monotonic()
+            try:
+                table_data, error = request_station_page(
+                    session, url, {
+                        "http": proxy_url,
+                        "https": proxy_url
+                    },
+                    drain_limit=STREAM_PROXY_DRAIN_LIMIT)
+            except (ProxyError, ConnectTimeout) as e:
+                # Do not keep pooled connections to a proxy that just broke
+                session_pool.discard(route)
+                observe_fetch('proxy', started, None, str(e))
+                raise
+            except RequestException as e:
+                observe_fetch('proxy', started, None, str(e))
+                raise
+            observe_fetch('proxy', started, table_data, error)
+            return table_data, error
     except (ProxyError, ConnectTimeout, RequestException) as e:
         return None, str(e)
 
@@ -476,260 +1407,1725 @@ def format_table_data(table_data, suffix=None):
     return message
 
 
-# Check proxies and fetch data for a user
-def check_proxies_and_fetch(url,
-                            chat_id,
-                            message_id=None,
-                            is_manual=False,
-                            suffix=None):
+# Send a message, or edit an existing one when message_id is given
+def deliver_message(chat_id, text, message_id=None, parse_mode=None):
+    if message_id:
+        try:
+            bot.edit_message_text(text,
+                                  chat_id,
+                                  message_id,
+                                  parse_mode=parse_mode)
+            return
+        except ApiTelegramException as e:
+            # Flood control applies to the fallback send as well
+            if e.error_code == 429:
+                raise
+        except Exception:
+            pass
+    bot.send_message(chat_id, text, parse_mode=parse_mode)
+
+
+# Seconds Telegram asked us to wait, or None if this is not a flood error
+def telegram_retry_after(error):
+    if not isinstance(error, ApiTelegramException) or error.error_code != 429:
+        return None
+    try:
+        return float(error.result_json['parameters']['retry_after'])
+    except (KeyError, TypeError, ValueError):
+        return 1.0
+
+
+# Token bucket refilled continuously at `rate` tokens per second
+class TokenBucket:
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity,
+                          self.tokens + max(0.0, now - self.updated) * self.rate)
+        self.updated = max(self.updated, now)
+
+    # Take a token now, going into debt if needed, and return the seconds to
+    # wait before using it. Reservations are served in the order they are made.
+    def reserve(self, now):
+        self._refill(now)
+        self.tokens -= 1
+        return max(0.0, self.updated - now) + max(0.0, -self.tokens / self.rate)
+
+    # Hand out nothing for `seconds`, then resume with a single token.
+    # Earlier reservations are dropped; their jobs have to reserve again.
+    def pause(self, now, seconds):
+        self._refill(now)
+        self.updated = max(self.updated, now + seconds)
+        self.tokens = min(self.capacity, 1)
+
+    def idle(self, now):
+        self._refill(now)
+        return self.updated <= now and self.tokens >= self.capacity
+
+
+# Outbound message queue paced by a global and a per-chat token bucket.
+# Jobs wait in a heap ordered by the time they may be sent next, so a chat
+# that is over its limit never holds up messages for other chats.
+class TelegramDispatcher:
+
+    def __init__(self, global_rate, per_chat_rate, workers, max_retries):
+        self.per_chat_rate = per_chat_rate
+        self.workers = workers
+        self.max_retries = max_retries
+        self._global = TokenBucket(global_rate, max(global_rate, 1))
+        self._chat_buckets = {}
+        self._heap = []
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+        self._global_lock = threading.Lock()
+        self._threads = []
+        self._stopping = False
+        self._pending = 0
+        self.stats = {'sent': 0, 'failed': 0, 'retried': 0, 'throttled': 0}
+
+    def _ensure_workers(self):
+        if self._threads:
+            return
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker,
+                                      name=f"telegram-send-{i}",
+                                      daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    # Queue a message (or an edit of message_id); returns a Future
+    def submit(self, chat_id, text, message_id=None, parse_mode=None):
+        future = Future()
+        job = {
+            'chat_id': chat_id,
+            'text': text,
+            'message_id': message_id,
+            'parse_mode': parse_mode,
+            'attempts': 0,
+            'paced': False,
+            'sequence': next(self._sequence),
+            'future': future
+        }
+        with self._cond:
+            if self._stopping:
+                future.set_exception(RuntimeError("Dispatcher stopped"))
+                return future
+            self._ensure_workers()
+            self._pending += 1
+            self._push(job, time.monotonic())
+        return future
+
+    # Callers must hold self._cond
+    def _push(self, job, ready_at):
+        heapq.heappush(self._heap, (ready_at, next(self._sequence), job))
+        self._cond.notify()
+
+    def _next_job(self):
+        with self._cond:
+            while True:
+                if self._heap:
+                    wait = self._heap[0][0] - time.monotonic()
+                    if wait <= 0:
+                        return heapq.heappop(self._heap)[2]
+                elif self._stopping:
+                    return None
+                else:
+                    wait = None
+                self._cond.wait(wait)
+
+    # Reserve the chat's next send slot and return the seconds until it
+    def _reserve_chat_slot(self, chat_id):
+        with self._cond:
+            now = time.monotonic()
+            bucket = self._chat_buckets.get(chat_id)
+            if bucket is None:
+                # Drop buckets of chats that have been quiet for a while
+                if len(self._chat_buckets) > 1000:
+                    for key in [
+                            k for k, b in self._chat_buckets.items()
+                            if b.idle(now)
+                    ]:
+                        del self._chat_buckets[key]
+                bucket = TokenBucket(self.per_chat_rate, 1)
+                self._chat_buckets[chat_id] = bucket
+            return bucket.reserve(now)
+
+    # Global pacing blocks the worker, since every queued job is waiting on it
+    def _take_global_token(self):
+        with self._global_lock:
+            wait = self._global.reserve(time.monotonic())
+        if wait:
+            time.sleep(wait)
+
+    # Hold back the chat (and, for private chats, every chat) for retry_after
+    # seconds. Telegram paces groups per chat, so a 429 there is chat-scoped;
+    # private chats are already paced below their own limit, so a 429 for one
+    # means the bot-wide limit was hit.
+    def _flood_wait(self, job, retry_after):
+        chat_id = job['chat_id']
+        with self._cond:
+            now = time.monotonic()
+            resume_at = now + retry_after
+            bucket = self._chat_buckets.get(chat_id)
+            if bucket is not None:
+                bucket.pause(now, retry_after)
+
+            # Queue the failed job ahead of the chat's later jobs; all of them
+            # reserve their slot again once the wait is over
+            later = [entry[2] for entry in self._heap
+                     if entry[2]['chat_id'] == chat_id]
+            later.sort(key=lambda queued: queued['sequence'])
+            self._heap = [entry for entry in self._heap
+                          if entry[2]['chat_id'] != chat_id]
+            heapq.heapify(self._heap)
+            for queued in [job] + later:
+                queued['paced'] = False
+                self._push(queued, resume_at)
+            self.stats['retried'] += 1
+        if not str(chat_id).startswith('-'):
+            with self._global_lock:
+                self._global.pause(time.monotonic(), retry_after)
+
+    def _finish(self, job, result=None, error=None):
+        with self._cond:
+            self._pending -= 1
+            if error is None:
+                self.stats['sent'] += 1
+            else:
+                self.stats['failed'] += 1
+            self._cond.notify_all()
+        if error is None:
+            job['future'].set_result(result)
+        else:
+            job['future'].set_exception(error)
+
+    def _worker(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+
+            # Each job reserves its chat slot once, keeping per-chat order
+            if not job['paced']:
+                job['paced'] = True
+                wait = self._reserve_chat_slot(job['chat_id'])
+                if wait:
+                    with self._cond:
+                        self.stats['throttled'] += 1
+                        self._push(job, time.monotonic() + wait)
+                    continue
+
+            self._take_global_token()
+            started = time.monotonic()
+            try:
+                result = deliver_message(job['chat_id'], job['text'],
+                                         job['message_id'], job['parse_mode'])
+            except Exception as e:
+                telegram_send_seconds.observe(time.monotonic() - started)
+                retry_after = telegram_retry_after(e)
+                if retry_after is not None and job['attempts'] < self.max_retries:
+                    telegram_messages.inc(outcome='retried')
+                    job['attempts'] += 1
+                    write_log(
+                        "WARNING",
+                        f"Telegram flood limit for chat {job['chat_id']}, retrying in {retry_after:.0f}s"
+                    )
+                    self._flood_wait(job, retry_after)
+                    continue
+                write_log(
+                    "ERROR",
+                    f"Error sending message to chat {job['chat_id']}: {e}")
+                telegram_messages.inc(outcome='failed')
+                self._finish(job, error=e)
+                continue
+            telegram_send_seconds.observe(time.monotonic() - started)
+            telegram_messages.inc(outcome='sent')
+            self._finish(job, result)
+
+    def pending(self):
+        with self._cond:
+            return self._pending
+
+    def snapshot(self):
+        with self._cond:
+            return dict(self.stats, pending=self._pending)
+
+    # Wait until everything queued so far is sent; False on timeout
+    def drain(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._pending:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    # Send what is already queued (up to timeout), then stop the workers
+    def stop(self, timeout=10):
+        drained = self.drain(timeout)
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(1)
+        if not drained:
+            write_log("WARNING",
+                      f"Stopped with {self.pending()} Telegram message(s) unsent")
+
+
+telegram_dispatcher = TelegramDispatcher(TELEGRAM_GLOBAL_RATE,
+                                         TELEGRAM_PER_CHAT_RATE,
+                                         TELEGRAM_SEND_WORKERS,
+                                         TELEGRAM_MAX_RETRIES)
+
+
+# Queue a send (or edit) through the rate-limited dispatcher
+def dispatch_message(chat_id, text, message_id=None, parse_mode=None):
+    return telegram_dispatcher.submit(chat_id, text, message_id, parse_mode)
+
+
+# Per-proxy latency and success tracking used to order proxy attempts
+class ProxyScoreboard:
+
+    def __init__(self, alpha, persist_interval):
+        self.alpha = alpha
+        self.persist_interval = persist_interval
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_persist = time.monotonic()
+
+    def record(self, proxy_entry, latency, success):
+        with self._lock:
+            stats = self._stats.setdefault(proxy_entry, {
+                'latency': None,
+                'fail_latency': None,
+                'success_rate': 0.5,
+                'attempts': 0,
+                'failures': 0,
+                'last_failure': None
+            })
+            key = 'latency' if success else 'fail_latency'
+            if stats[key] is None:
+                stats[key] = latency
+            else:
+                stats[key] += self.alpha * (latency - stats[key])
+            outcome = 1.0 if success else 0.0
+            if stats['attempts'] == 0:
+                stats['success_rate'] = outcome
+            else:
+                stats['success_rate'] += self.alpha * (outcome -
+                                                       stats['success_rate'])
+            stats['attempts'] += 1
+            if not success:
+                stats['failures'] += 1
+                stats['last_failure'] = time.time()
+            self._dirty = True
+        self.persist()
+
+    # Expected seconds until a successful fetch when this proxy is tried
+    def expected_time(self, proxy_entry):
+        with self._lock:
+            stats = self._stats.get(proxy_entry)
+            if stats is None:
+                return FETCH_TIMEOUT / 2
+            latency = stats['latency'] if stats[
+                'latency'] is not None else FETCH_TIMEOUT / 2
+            fail_latency = stats['fail_latency'] if stats[
+                'fail_latency'] is not None else FETCH_TIMEOUT
+            success_rate = max(stats['success_rate'], 0.01)
+            last_failure = stats['last_failure']
+
+        if last_failure and time.time() - last_failure < PROXY_FAILURE_COOLDOWN:
+            success_rate = max(success_rate / 2, 0.01)
+
+        # Cost of one attempt divided by its chance of success
+        cost = success_rate * latency + (1 - success_rate) * fail_latency
+        return cost / success_rate
+
+    def rank(self, proxy_entries):
+        return sorted(proxy_entries, key=self.expected_time)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                proxy_entry: dict(stats)
+                for proxy_entry, stats in self._stats.items()
+            }
+
+    # Load persisted stats from the document next to proxy_config
+    def load(self):
+        try:
+            if db is None:
+                return
+            doc = db.proxies.find_one({'_id': 'proxy_scoreboard'})
+            if not doc:
+                return
+            with self._lock:
+                for item in doc.get('stats', []):
+                    proxy_entry = item.pop('proxy', None)
+                    if proxy_entry:
+                        self._stats[proxy_entry] = item
+            write_log(
+                "INFO",
+                f"Loaded proxy scoreboard for {len(self._stats)} proxies")
+        except Exception as e:
+            write_log("ERROR", f"Error loading proxy scoreboard: {e}")
+
+    def persist(self, force=False):
+        with self._lock:
+            if not self._dirty or (not force and time.monotonic() -
+                                   self._last_persist < self.persist_interval):
+                return
+            # Proxy entries contain dots, so store a list instead of a mapping
+            stats = [
+                dict(stats, proxy=proxy_entry)
+                for proxy_entry, stats in self._stats.items()
+            ]
+            self._dirty = False
+            self._last_persist = time.monotonic()
+        try:
+            if db is None:
+                return
+            db.proxies.replace_one({'_id': 'proxy_scoreboard'}, {
+                '_id': 'proxy_scoreboard',
+                'stats': stats,
+                'updated_at': datetime.now(INDIAN_TIMEZONE)
+            },
+                                   upsert=True)
+        except Exception as e:
+            write_log("ERROR", f"Error saving proxy scoreboard: {e}")
+
+
+proxy_scoreboard = ProxyScoreboard(PROXY_EWMA_ALPHA,
+                                   PROXY_SCOREBOARD_PERSIST_INTERVAL)
+
+
+# Closed/open/half-open circuit per proxy so known-dead proxies are skipped
+class ProxyCircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, threshold, base_delay, max_delay):
+        self.threshold = threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._circuits = {}
+        self._lock = threading.Lock()
+
+    def _circuit(self, proxy_entry):
+        return self._circuits.setdefault(
+            proxy_entry, {
+                'state': self.CLOSED,
+                'failures': 0,
+                'trips': 0,
+                'retry_at': 0.0,
+                'probe_started': 0.0
+            })
+
+    # Callers must hold self._lock
+    def _available(self, circuit, now):
+        if circuit['state'] == self.CLOSED:
+            return True
+        if circuit['state'] == self.OPEN:
+            return now >= circuit['retry_at']
+        # Half-open: a new probe may go if the last one never reported
+        return now - circuit['probe_started'] > 2 * FETCH_TIMEOUT
+
+    # Whether allow() would let a request through now, without taking the
+    # half-open probe slot. Use it to filter candidates before attempting.
+    def available(self, proxy_entry):
+        with self._lock:
+            circuit = self._circuits.get(proxy_entry)
+            return circuit is None or self._available(circuit,
+                                                      time.monotonic())
+
+    # Whether a request may go through this proxy now. An open circuit lets
+    # a single half-open probe through once its backoff has elapsed, so call
+    # this right before the request is made.
+    def allow(self, proxy_entry):
+        now = time.monotonic()
+        with self._lock:
+            circuit = self._circuit(proxy_entry)
+            if not self._available(circuit, now):
+                return False
+            if circuit['state'] != self.CLOSED:
+                circuit['state'] = self.HALF_OPEN
+                circuit['probe_started'] = now
+            return True
+
+    # Give back a half-open probe slot that was taken but never used
+    def release_probe(self, proxy_entry):
+        with self._lock:
+            circuit = self._circuits.get(proxy_entry)
+            if circuit and circuit['state'] == self.HALF_OPEN:
+                circuit['state'] = self.OPEN
+
+    # A health probe got through the proxy: let the next request make its
+    # half-open attempt now instead of waiting out the backoff. Only a real
+    # success closes the circuit and resets the backoff.
+    def allow_retry(self, proxy_entry):
+        with self._lock:
+            circuit = self._circuits.get(proxy_entry)
+            if circuit and circuit['state'] == self.OPEN:
+                circuit['retry_at'] = min(circuit['retry_at'],
+                                          time.monotonic())
+
+    # Returns True when the proxy recovered from an open circuit
+    def record_success(self, proxy_entry):
+        with self._lock:
+            circuit = self._circuit(proxy_entry)
+            recovered = circuit['state'] != self.CLOSED
+            circuit.update(state=self.CLOSED, failures=0, trips=0)
+        if recovered:
+            write_log("INFO", f"Proxy {proxy_entry} recovered, circuit closed")
+        return recovered
+
+    def record_failure(self, proxy_entry):
+        with self._lock:
+            circuit = self._circuit(proxy_entry)
+            circuit['failures'] += 1
+            if circuit['state'] == self.CLOSED and circuit[
+                    'failures'] < self.threshold:
+                return
+            circuit['trips'] += 1
+            delay = min(self.base_delay * 2**(circuit['trips'] - 1),
+                        self.max_delay)
+            circuit['state'] = self.OPEN
+            circuit['retry_at'] = time.monotonic() + delay
+        write_log("INFO",
+                  f"Proxy {proxy_entry} circuit open, retry in {delay}s")
+
+    # Returns (state, seconds until the next probe)
+    def state(self, proxy_entry):
+        with self._lock:
+            circuit = self._circuits.get(proxy_entry)
+            if circuit is None:
+                return self.CLOSED, 0
+            retry_in = max(0, int(circuit['retry_at'] - time.monotonic()))
+            return circuit['state'], retry_in
+
+
+proxy_breakers = ProxyCircuitBreaker(PROXY_BREAKER_THRESHOLD,
+                                     PROXY_BREAKER_BASE_DELAY,
+                                     PROXY_BREAKER_MAX_DELAY)
+
+
+# Record a proxy outcome on the scoreboard and its circuit breaker
+def record_proxy_result(proxy_entry, latency, success):
+    proxy_scoreboard.record(proxy_entry, latency, success)
+    if success:
+        proxy_breakers.record_success(proxy_entry)
+        # Promote a working proxy back out of the failed list
+        if proxy_entry in (_proxy_config or {}).get('failed', []):
+            proxy_failures.record_recovery(proxy_entry)
+    else:
+        proxy_breakers.record_failure(proxy_entry)
+
+
+# Fetch through one proxy entry and record the outcome
+def attempt_proxy(url, proxy_entry):
+    proxy, scheme = proxy_entry.rsplit(':', 1)
+    attempt_start = time.monotonic()
+    table_data, error = fetch_table_data(url, proxy, scheme)
+    record_proxy_result(
+        proxy_entry,
+        time.monotonic() - attempt_start,
+        bool(table_data) or bool(error and "Invalid station ID" in error))
+    return table_data, error
+
+
+# Collects proxy failures and owner alerts in memory. Failed proxies are
+# added to proxy_config in one batched update and the owner gets one digest
+# per cycle instead of a message per failure.
+class ProxyFailureTracker:
+
+    def __init__(self, flush_interval, alert_interval):
+        self.flush_interval = flush_interval
+        self.alert_interval = alert_interval
+        self._failures = {}
+        self._alerts = {}
+        self._pending_failed = set()
+        self._pending_recovered = set()
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._last_digest = time.monotonic()
+
+    def record(self, proxy_entry, error):
+        with self._lock:
+            stats = self._failures.get(proxy_entry)
+            if stats is None:
+                # Log the first failure of each proxy per digest window
+                write_log("ERROR", f"Proxy {proxy_entry} failed: {error}")
+                stats = self._failures[proxy_entry] = {'count': 0}
+            stats['count'] += 1
+            stats['last_error'] = error
+            self._pending_failed.add(proxy_entry)
+            self._pending_recovered.discard(proxy_entry)
+
+    def record_recovery(self, proxy_entry):
+        with self._lock:
+            self._pending_recovered.add(proxy_entry)
+            self._pending_failed.discard(proxy_entry)
+
+    def alert(self, message):
+        with self._lock:
+            self._alerts[message] = self._alerts.get(message, 0) + 1
+
+    # Apply pending failed/recovered proxies in at most two batched updates
+    def flush(self, force=False):
+        with self._lock:
+            if not (self._pending_failed or self._pending_recovered) or (
+                    not force and time.monotonic() - self._last_flush <
+                    self.flush_interval):
+                return
+            known_failed = (_proxy_config or {}).get('failed', [])
+            failed = [
+                entry for entry in self._pending_failed
+                if entry not in known_failed
+            ]
+            recovered = [
+                entry for entry in self._pending_recovered
+                if entry in known_failed
+            ]
+            self._pending_failed.clear()
+            self._pending_recovered.clear()
+            self._last_flush = time.monotonic()
+        if db is None:
+            return
+        if failed:
+            self._update_failed({'$addToSet': {'failed': {'$each': failed}}})
+            write_log("INFO",
+                      f"Marked {len(failed)} proxy(s) as failed in MongoDB")
+        if recovered:
+            self._update_failed({'$pull': {'failed': {'$in': recovered}}})
+            write_log(
+                "INFO",
+                f"Promoted {len(recovered)} recovered proxy(s) in MongoDB")
+
+    def _update_failed(self, update):
+        try:
+            update['$set'] = {'updated_at': datetime.now(INDIAN_TIMEZONE)}
+            update['$inc'] = {'version': 1}
+            doc = db.proxies.find_one_and_update(
+                {'_id': 'proxy_config'},
+                update,
+                upsert=True,
+                return_document=ReturnDocument.AFTER)
+            _cache_proxy_config(doc.get('proxies', []), doc.get('failed', []),
+                                doc.get('version', 0))
+        except Exception as e:
+            write_log("ERROR", f"Error saving failed proxies to MongoDB: {e}")
+
+    # Send the owner one message summarising failures since the last digest
+    def send_digest(self, force=False):
+        with self._lock:
+            if not self._failures and not self._alerts:
+                return
+            if not force and time.monotonic(
+            ) - self._last_digest < self.alert_interval:
+                return
+            failures, self._failures = self._failures, {}
+            alerts, self._alerts = self._alerts, {}
+            self._last_digest = time.monotonic()
+
+        msg = "🚨 Proxy failure digest\n"
+        for message, count in alerts.items():
+            msg += f"\n{message} (x{count})\n"
+        for proxy_entry, stats in sorted(failures.items(),
+                                         key=lambda item: -item[1]['count']):
+            msg += f"\n• {proxy_entry} failed {stats['count']} time(s)\n  Last error: {stats['last_error']}\n"
+        try:
+            bot.send_message(OWNER_ID, msg[:4000])
+        except Exception as e:
+            write_log("ERROR", f"Error sending proxy failure digest: {e}")
+
+
+proxy_failures = ProxyFailureTracker(PROXY_FAILURE_FLUSH_INTERVAL,
+                                     PROXY_ALERT_INTERVAL)
+
+
+# Pool for hedged attempts, kept apart from fetch_executor so a fetch
+# worker waiting on its race can never starve the race itself
+hedge_executor = ThreadPoolExecutor(max_workers=FETCH_MAX_WORKERS *
+                                    HEDGE_FANOUT,
+                                    thread_name_prefix="hedge")
+
+
+# Race the same request through several routes; the first valid table wins.
+# A route of None means a direct request.
+def race_station_fetch(url, routes):
+    futures = {}
+    for route in routes:
+        if route is None:
+            futures[hedge_executor.submit(fetch_table_data_direct,
+                                          url)] = route
+        else:
+            futures[hedge_executor.submit(attempt_proxy, url, route)] = route
+
+    last_error = None
+    try:
+        for future in as_completed(futures):
+            route = futures[future]
+            try:
+                table_data, error = future.result()
+            except Exception as e:
+                table_data, error = None, str(e)
+
+            if table_data or (error and "Invalid station ID" in error):
+                write_log("INFO",
+                          f"Hedged fetch won by {route or 'direct request'}")
+                return table_data, error
+            last_error = error
+            if route is not None:
+                proxy_failures.record(route, error)
+    finally:
+        # Drop attempts that have not started; running ones finish unobserved
+        for future, route in futures.items():
+            if future.cancel() and route is not None:
+                proxy_breakers.release_probe(route)
+
+    return None, last_error
+
+
+# Fetch station table data through the proxies, falling back to a direct request
+def fetch_station_data(url, hedge=False):
     proxies_data = load_proxies()
 
     # Check if proxies data is valid
     if not proxies_data or "proxies" not in proxies_data or not isinstance(
             proxies_data["proxies"], list):
-        error_msg = "❌ Proxies configuration is invalid or empty."
         write_log(
             "ERROR",
             "Proxies configuration is empty or invalid structure"
         )
 
-        if str(chat_id) != OWNER_ID:
-            bot.send_message(
-                OWNER_ID,
-                "🚨 Proxies configuration is invalid or empty. Check MongoDB proxy configuration."
-            )
+        proxy_failures.alert(
+            "Proxies configuration is invalid or empty. Check MongoDB proxy configuration."
+        )
 
         # Try direct request as fallback
         write_log("INFO", "Attempting direct request without proxy")
         table_data, error = fetch_table_data_direct(url)
-
         if table_data:
-            formatted_data = format_table_data(table_data, suffix)
-            if message_id:
-                try:
-                    bot.edit_message_text(formatted_data,
-                                          chat_id,
-                                          message_id,
-                                          parse_mode='HTML')
-                except Exception as e:
-                    bot.send_message(chat_id,
-                                     formatted_data,
-                                     parse_mode='HTML')
-            else:
-                bot.send_message(chat_id, formatted_data, parse_mode='HTML')
             write_log("INFO", "Direct request SUCCESS")
-            return
         else:
             write_log("ERROR", f"Direct request also failed: {error}")
-            final_error = f"❌ All connection methods failed.\n\nDirect request error: {error}"
-            if message_id:
-                try:
-                    bot.edit_message_text(final_error, chat_id, message_id)
-                except Exception as e:
-                    bot.send_message(chat_id, final_error)
-            else:
-                bot.send_message(chat_id, final_error)
-            return
+        return table_data, error
 
     proxies = proxies_data["proxies"]
-    failed_proxies = proxies_data.get("failed", [])
-    success = False
-
-    # Send acknowledgment message for manual fetch
-    if is_manual and not message_id:
-        ack_msg = bot.send_message(chat_id,
-                                   "🔄 Fetching latest weather data...")
-        message_id = ack_msg.message_id
 
     # Check if there are any proxies to use
     if not proxies:
-        error_msg = "❌ No proxies available in configuration."
         write_log("ERROR", "Proxies list is empty")
 
-        if str(chat_id) != OWNER_ID:
-            bot.send_message(
-                OWNER_ID,
-                "🚨 No proxies available. Please add proxies using /update_proxy command."
-            )
+        proxy_failures.alert(
+            "No proxies available. Please add proxies using /update_proxy command."
+        )
 
         # Try direct request as fallback
         write_log("INFO", "No proxies available, attempting direct request")
         table_data, error = fetch_table_data_direct(url)
-
         if table_data:
-            formatted_data = format_table_data(table_data, suffix)
-            if message_id:
-                try:
-                    bot.edit_message_text(formatted_data,
-                                          chat_id,
-                                          message_id,
-                                          parse_mode='HTML')
-                except Exception as e:
-                    bot.send_message(chat_id,
-                                     formatted_data,
-                                     parse_mode='HTML')
-            else:
-                bot.send_message(chat_id, formatted_data, parse_mode='HTML')
             write_log("INFO", "Direct request SUCCESS")
-            return
         else:
             write_log("ERROR", f"Direct request also failed: {error}")
-            final_error = f"❌ All connection methods failed.\n\nDirect request error: {error}"
-            if message_id:
-                try:
-                    bot.edit_message_text(final_error, chat_id, message_id)
-                except Exception as e:
-                    bot.send_message(chat_id, final_error)
-            else:
-                bot.send_message(chat_id, final_error)
-            return
-
-    # Try each proxy
+        return table_data, error
+
+    # Skip proxies whose circuit is open; the probe slot of a recovering
+    # proxy is only taken when it is actually attempted
+    ranked = [
+        proxy_entry for proxy_entry in proxy_scoreboard.rank(proxies)
+        if ':' in proxy_entry and proxy_breakers.available(proxy_entry)
+    ]
     for proxy_entry in proxies:
+        if ':' not in proxy_entry:
+            write_log("ERROR", f"Invalid proxy format: {proxy_entry}")
+    if not ranked:
+        write_log("INFO", "All proxy circuits are open")
+
+    # Race the best routes first when hedging is requested
+    direct_tried = False
+    if hedge and ranked:
+        routes = [
+            proxy_entry for proxy_entry in ranked[:HEDGE_FANOUT]
+            if proxy_breakers.allow(proxy_entry)
+        ]
+        if HEDGE_INCLUDE_DIRECT:
+            routes.append(None)
+            direct_tried = True
+        table_data, error = race_station_fetch(url, routes)
+        if table_data or (error and "Invalid station ID" in error):
+            return table_data, error
+        ranked = ranked[HEDGE_FANOUT:]
+
+    # Try each remaining proxy, fastest expected route first
+    for proxy_entry in ranked:
+        if not proxy_breakers.allow(proxy_entry):
+            continue
         try:
-            if ':' not in proxy_entry:
-                write_log("ERROR", f"Invalid proxy format: {proxy_entry}")
-                continue
-
-            proxy, scheme = proxy_entry.rsplit(':', 1)
-            table_data, error = fetch_table_data(url, proxy, scheme)
+            table_data, error = attempt_proxy(url, proxy_entry)
 
             if table_data:
-                success = True
-                formatted_data = format_table_data(table_data, suffix)
-
-                if message_id:
-                    try:
-                        bot.edit_message_text(formatted_data,
-                                              chat_id,
-                                              message_id,
-                                              parse_mode='HTML')
-                    except Exception as e:
-                        bot.send_message(chat_id,
-                                         formatted_data,
-                                         parse_mode='HTML')
-                else:
-                    bot.send_message(chat_id,
-                                     formatted_data,
-                                     parse_mode='HTML')
-
-                write_log("INFO", f"Proxy {proxy} ({scheme}) SUCCESS")
-                break
+                write_log("INFO", f"Proxy {proxy_entry} SUCCESS")
+                return table_data, None
+            elif error and "Invalid station ID" in error:
+                # The proxy worked, the station itself does not exist
+                return None, error
             else:
-                if proxy_entry not in failed_proxies:
-                    failed_proxies.append(proxy_entry)
-                    proxies_data["failed"] = failed_proxies
-                    save_proxies(proxies_data)
-                    write_log("ERROR",
-                              f"Proxy {proxy} ({scheme}) failed: {error}")
-
-                    if str(chat_id) != OWNER_ID:
-                        bot.send_message(
-                            OWNER_ID,
-                            f"🚨 Proxy failed: {proxy} ({scheme})\nError: {error}"
-                        )
+                proxy_failures.record(proxy_entry, error)
         except Exception as e:
             write_log("ERROR", f"Error processing proxy {proxy_entry}: {e}")
             continue
 
+    if direct_tried:
+        write_log("ERROR", f"All routes failed: {error}")
+        return None, error
+
     # If all proxies failed, try direct request
-    if not success:
-        write_log("INFO",
-                  "All proxies failed, attempting direct request as fallback")
-        table_data, error = fetch_table_data_direct(url)
+    write_log("INFO",
+              "All proxies failed, attempting direct request as fallback")
+    table_data, error = fetch_table_data_direct(url)
+    if table_data:
+        write_log("INFO", "Direct request SUCCESS (fallback)")
+    else:
+        write_log("ERROR", f"Direct request also failed: {error}")
+    return table_data, error
+
+
+# Worker pool shared by the scheduler and command handlers for station fetches
+fetch_executor = ThreadPoolExecutor(max_workers=FETCH_MAX_WORKERS,
+                                    thread_name_prefix="fetch")
+
+
+# Submit a station fetch to the worker pool and return its future
+def submit_fetch(url, hedge=False):
+    return fetch_executor.submit(fetch_station_data, url, hedge)
+
+
+# Size-bounded LRU cache of parsed station readings with a TTL
+class StationCache:
+
+    def __init__(self, ttl, max_size):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, suffix):
+        with self._lock:
+            entry = self._entries.get(suffix)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[suffix]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(suffix)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, suffix, table_data):
+        with self._lock:
+            self._entries[suffix] = (time.monotonic() + self.ttl, table_data)
+            self._entries.move_to_end(suffix)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses
+            }
 
-        if table_data:
-            formatted_data = format_table_data(table_data, suffix)
-            if message_id:
-                try:
-                    bot.edit_message_text(formatted_data,
-                                          chat_id,
-                                          message_id,
-                                          parse_mode='HTML')
-                except Exception as e:
-                    bot.send_message(chat_id,
-                                     formatted_data,
-                                     parse_mode='HTML')
-            else:
-                bot.send_message(chat_id, formatted_data, parse_mode='HTML')
-            write_log("INFO", "Direct request SUCCESS (fallback)")
-        else:
-            write_log("ERROR", f"Direct request also failed: {error}")
-            final_error = f"❌ All proxies and direct connection failed.\n\nLast error: {error}"
-            if message_id:
-                try:
-                    bot.edit_message_text(final_error, chat_id, message_id)
-                except Exception as e:
-                    bot.send_message(chat_id, final_error)
-            else:
-                bot.send_message(chat_id, final_error)
 
+station_cache = StationCache(STATION_CACHE_TTL, STATION_CACHE_SIZE)
+
+# Fetches currently running per station, so concurrent misses share one request
+_inflight_lock = threading.Lock()
+_inflight_fetches = {}
 
-# Check Indian time and run automatic updates
-def check_indian_time_and_update():
+
+# Cache the result before dropping the in-flight entry, so a lookup in
+# between finds one or the other and never starts a second fetch
+def _finish_station_fetch(suffix, future):
     try:
-        # Get current time in Indian timezone
-        indian_time = datetime.now(INDIAN_TIMEZONE)
-        current_minute = indian_time.minute
+        table_data, error = future.result()
+        if table_data:
+            station_cache.put(suffix, table_data)
+    except Exception:
+        pass
+    with _inflight_lock:
+        if _inflight_fetches.get(suffix) is future:
+            del _inflight_fetches[suffix]
+
+
+# Get a future for a station's readings, served from the cache when fresh
+def submit_station_fetch(suffix, refresh=False, hedge=False):
+    if not refresh:
+        table_data = station_cache.get(suffix)
+        if table_data is not None:
+            future = Future()
+            future.set_result((table_data, None))
+            return future
+
+    with _inflight_lock:
+        future = _inflight_fetches.get(suffix)
+        if future is not None:
+            return future
+        future = submit_fetch(f"{URL_PREFIX}{suffix}", hedge)
+        _inflight_fetches[suffix] = future
+
+    future.add_done_callback(partial(_finish_station_fetch, suffix))
+    return future
+
+
+def get_station_data(suffix, refresh=False, hedge=False):
+    return submit_station_fetch(suffix, refresh, hedge).result()
+
+
+# Latest probe result per proxy entry
+proxy_probe_results = {}
+
+
+# Probe one proxy: TCP connect time to the proxy, then a full request
+# through it to PROXY_PROBE_URL
+def probe_proxy(proxy_entry):
+    result = {
+        'success': False,
+        'connect_time': None,
+        'total_time': None,
+        'error': None,
+        'checked_at': datetime.now(INDIAN_TIMEZONE)
+    }
+    start = time.monotonic()
+    try:
+        host, port, scheme = proxy_entry.split(':')
+        with socket.create_connection((host, int(port)),
+                                      timeout=FETCH_TIMEOUT):
+            result['connect_time'] = time.monotonic() - start
+
+        # Probes skip route_slot: the probe target is not the upstream host,
+        # and probe concurrency is already bounded by PROXY_PROBE_WORKERS
+        # with at most one probe per proxy
+        proxy_url = f"{scheme}://{host}:{port}"
+        response = session_pool.get(proxy_entry).get(
+            PROXY_PROBE_URL,
+            proxies={
+                "http": proxy_url,
+                "https": proxy_url
+            },
+            timeout=FETCH_TIMEOUT)
+        result['total_time'] = time.monotonic() - start
+        result['success'] = response.status_code < 400
+        if not result['success']:
+            result['error'] = f"HTTP {response.status_code}"
+    except (OSError, ValueError, RequestException) as e:
+        result['error'] = str(e)
+    return result
+
+
+# Probe proxies in parallel. The probe target is not the upstream host, so
+# results stay out of the scoreboard and never close a circuit: a failed probe
+# counts towards opening a closed circuit, a successful one only brings an open
+# circuit's half-open attempt forward. Failures of configured proxies also go
+# to the failure tracker.
+def probe_proxies(proxy_entries, track_failures=True):
+    if not proxy_entries:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(PROXY_PROBE_WORKERS,
+                                            len(proxy_entries)),
+                            thread_name_prefix="probe") as pool:
+        results = dict(
+            zip(proxy_entries, pool.map(probe_proxy, proxy_entries)))
+
+    known_failed = (_proxy_config or {}).get('failed', [])
+    for proxy_entry, result in results.items():
+        proxy_probe_results[proxy_entry] = result
+        circuit_closed = proxy_breakers.state(
+            proxy_entry)[0] == ProxyCircuitBreaker.CLOSED
+        if result['success']:
+            proxy_breakers.allow_retry(proxy_entry)
+            continue
+        if circuit_closed:
+            proxy_breakers.record_failure(proxy_entry)
+        # Only a proxy going down is reported, not one already failed or open
+        if track_failures and circuit_closed and proxy_entry not in known_failed:
+            proxy_failures.record(proxy_entry, f"probe: {result['error']}")
+    return results
 
-        # Replace the last checking time log instead of appending
-        replace_last_checking_log(
-            f"Checking Indian time: {indian_time.strftime('%Y-%m-%d %H:%M:%S IST')}, minute: {current_minute}"
-        )
 
-        if current_minute == 7:
-            write_log(
-                "INFO",
-                "Indian time minute is 16, running automatic /rf command")
-            subscriptions = load_subscriptions()
+# Short probe summary for /proxy_list
+def probe_summary(proxy_entry):
+    result = proxy_probe_results.get(proxy_entry)
+    if not result:
+        return ""
+    if not result['success']:
+        return ", probe failed"
+    return f", probe {result['connect_time']:.2f}s/{result['total_time']:.2f}s"
 
-            if not subscriptions:
-                write_log("INFO",
-                          "No subscriptions found for automatic update")
-                return
 
-            for chat_id, suffixes in subscriptions.items():
-                try:
-                    # Handle both old format (string) and new format (list)
-                    if isinstance(suffixes, str):
-                        suffixes = [suffixes]
+# Set while run_auto_update works through a slot, which ends with its own digest
+auto_update_running = threading.Event()
+
+
+# Persist proxy failures and send the owner digest in every worker role, so
+# failures seen by commands are not only handled by the scheduler. During a
+# cycle the digest waits for the one sent when the cycle ends.
+def run_proxy_failure_flusher():
+    while True:
+        try:
+            proxy_failures.flush()
+            if not auto_update_running.is_set():
+                proxy_failures.send_digest()
+        except Exception as e:
+            write_log("ERROR", f"Proxy failure flush error: {e}")
+        time.sleep(PROXY_FAILURE_FLUSH_INTERVAL)
+
+
+# Periodically probe every configured proxy, active and failed
+def run_proxy_prober():
+    write_log("INFO",
+              f"Starting proxy prober - every {PROXY_PROBE_INTERVAL}s")
+    while True:
+        try:
+            proxies_data = load_proxies()
+            entries = []
+            for proxy_entry in proxies_data.get("proxies", []) + proxies_data.get(
+                    "failed", []):
+                if proxy_entry.count(':') == 2 and proxy_entry not in entries:
+                    entries.append(proxy_entry)
+
+            probe_start = time.monotonic()
+            results = probe_proxies(entries)
+            healthy = sum(1 for result in results.values() if result['success'])
+            if results:
+                write_log(
+                    "INFO",
+                    f"Proxy probe: {healthy}/{len(results)} healthy in {time.monotonic() - probe_start:.1f}s"
+                )
+        except Exception as e:
+            write_log("ERROR", f"Proxy prober error: {e}")
+        time.sleep(PROXY_PROBE_INTERVAL)
+
+
+# Check proxies and fetch data for a user
+def check_proxies_and_fetch(url,
+                            chat_id,
+                            message_id=None,
+                            is_manual=False,
+                            suffix=None,
+                            hedge=False,
+                            future=None):
+    # Send acknowledgment message for manual fetch
+    if is_manual and not message_id:
+        ack_msg = bot.send_message(chat_id,
+                                   "🔄 Fetching latest weather data...")
+        message_id = ack_msg.message_id
+
+    # A future already started by the caller is used as is; a failed fetch
+    # is neither cached nor in flight any more, so looking it up again would
+    # repeat the whole proxy sweep
+    started = time.monotonic()
+    if future is None:
+        if suffix:
+            future = submit_station_fetch(suffix, hedge=hedge)
+        else:
+            future = submit_fetch(url, hedge)
+    table_data, error = future.result()
+    command_fetch_seconds.observe(time.monotonic() - started)
+
+    if table_data:
+        return dispatch_message(chat_id,
+                                format_table_data(table_data, suffix),
+                                message_id,
+                                parse_mode='HTML')
+    else:
+        return dispatch_message(
+            chat_id,
+            f"❌ All proxies and direct connection failed.\n\nLast error: {error}",
+            message_id)
+
+
+# Deliver one station's fetch result to all of its subscribers
+def broadcast_station_result(suffix, chat_ids, table_data, error):
+    if table_data:
+        text = format_table_data(table_data, suffix)
+        parse_mode = 'HTML'
+
+        # Users in "only when changed" mode skip unchanged readings
+        if not update_station_fingerprint(suffix,
+                                          table_fingerprint(table_data)):
+            skipped = [c for c in chat_ids if c in only_changed_chats]
+            if skipped:
+                chat_ids = [c for c in chat_ids if c not in only_changed_chats]
+                write_log(
+                    "INFO",
+                    f"Station {suffix} unchanged, skipped {len(skipped)} subscriber(s)"
+                )
+    else:
+        text = f"❌ All proxies and direct connection failed.\n\nLast error: {error}"
+        parse_mode = None
+
+    # The dispatcher paces sends; failures are logged as they happen
+    futures = [
+        dispatch_message(chat_id, text, parse_mode=parse_mode)
+        for chat_id in chat_ids
+    ]
+
+    write_log(
+        "INFO",
+        f"Station {suffix} queued for {len(futures)} subscriber(s)")
+    return futures
+
+
+# Scheduler liveness, kept in memory instead of being logged every minute
+scheduler_state = {
+    'last_tick': None,
+    'next_run': None,
+    'last_run_slot': None,
+    'last_cycle_started': None,
+    'last_cycle_duration': None,
+    'last_cycle_stations': 0
+}
+scheduler_state_lock = threading.Lock()
+
+
+def update_scheduler_state(**fields):
+    with scheduler_state_lock:
+        scheduler_state.update(fields)
+
+
+def get_scheduler_state():
+    with scheduler_state_lock:
+        return dict(scheduler_state)
+
+
+# First automatic update time (Indian timezone) strictly after `after`
+def next_auto_update_time(after):
+    hour = after.replace(minute=0, second=0, microsecond=0)
+    for minute in AUTO_UPDATE_MINUTES:
+        slot = hour.replace(minute=minute)
+        if slot > after:
+            return slot
+    return hour + timedelta(hours=1, minutes=AUTO_UPDATE_MINUTES[0])
+
+
+# Slot to start from: one that just passed is still run if it is within
+# SCHEDULER_MISSED_GRACE, e.g. after a restart a few seconds past the trigger.
+# Shards that already ran it are not claimed again.
+def first_auto_update_time(now):
+    hour = now.replace(minute=0, second=0, microsecond=0)
+    slot = hour - timedelta(hours=1) + timedelta(minutes=AUTO_UPDATE_MINUTES[-1])
+    for minute in AUTO_UPDATE_MINUTES:
+        if hour.replace(minute=minute) <= now:
+            slot = hour.replace(minute=minute)
+    if (now - slot).total_seconds() <= SCHEDULER_MISSED_GRACE:
+        return slot
+    return next_auto_update_time(now)
+
+
+# Scheduler and cache state for the /health endpoint and /status
+def health_status():
+    state = get_scheduler_state()
+    last_tick = state['last_tick']
+    # Command-only workers do not run the scheduler
+    healthy = WORKER_ROLE == 'bot' or last_tick is not None and (
+        datetime.now(INDIAN_TIMEZONE) -
+        last_tick).total_seconds() < SCHEDULER_STALE_AFTER
+
+    def iso(value):
+        return value.isoformat() if value else None
+
+    return {
+        'healthy': healthy,
+        'scheduler': {
+            'last_tick': iso(last_tick),
+            'next_run': iso(state['next_run']),
+            'last_run_slot': iso(state['last_run_slot']),
+            'last_cycle_started': iso(state['last_cycle_started']),
+            'last_cycle_duration': state['last_cycle_duration'],
+            'last_cycle_stations': state['last_cycle_stations']
+        },
+        'worker': {
+            'id': WORKER_ID,
+            'role': WORKER_ROLE,
+            'shards': sorted(shard_leases.owned()),
+            'shard_count': SCHEDULER_SHARDS
+        },
+        'station_cache': station_cache.stats(),
+        'log_pipeline': log_pipeline_stats(),
+        'telegram': telegram_dispatcher.snapshot(),
+        'commands': command_jobs.snapshot(),
+        'subscriptions': dict(zip(('users', 'stations'),
+                                  subscription_store.counts()))
+    }
+
+
+# Shard of the scheduled cycle a station belongs to
+def station_shard(suffix):
+    return zlib.crc32(str(suffix).encode('utf-8')) % SCHEDULER_SHARDS
+
+
+# Shard ownership through lease documents in db.scheduler_leases. Scheduler
+# workers register in db.scheduler_workers and each holds a fair share of the
+# shards; the leases of a worker that stops heartbeating expire and are
+# claimed by the others.
+class ShardLeaseManager:
+
+    def __init__(self, worker_id, shards, ttl):
+        self.worker_id = worker_id
+        self.shards = shards
+        self.ttl = ttl
+        self._owned = set()
+        self._owned_until = 0.0
+        self._lock = threading.Lock()
+
+    def prepare(self):
+        try:
+            # MongoDB removes registrations of dead workers on its own
+            db.scheduler_workers.create_index('expires_at',
+                                              expireAfterSeconds=0)
+        except Exception as e:
+            write_log("ERROR", f"Error preparing scheduler collections: {e}")
+
+    # Take a lease that is free, expired or already ours, optionally marking
+    # it as run for a slot. False if another live worker holds it or the slot
+    # already ran (the upsert then collides with the existing document).
+    def _try_claim(self, shard, now, slot=None):
+        query = {
+            '_id': shard,
+            '$or': [{
+                'owner': self.worker_id
+            }, {
+                'owner': None
+            }, {
+                'expires_at': {
+                    '$lte': now
+                }
+            }]
+        }
+        update = {
+            'owner': self.worker_id,
+            'expires_at': now + timedelta(seconds=self.ttl)
+        }
+        if slot is not None:
+            query['last_slot'] = {'$ne': slot}
+            update['last_slot'] = slot
+        try:
+            db.scheduler_leases.update_one(query, {'$set': update},
+                                           upsert=True)
+            return True
+        except DuplicateKeyError:
+            return False
+
+    def _remember(self, owned):
+        with self._lock:
+            self._owned = set(owned)
+            self._owned_until = time.monotonic() + self.ttl
+
+    # Shards still covered by the last successful renewal
+    def owned(self):
+        with self._lock:
+            if time.monotonic() < self._owned_until:
+                return set(self._owned)
+            return set()
+
+    # Heartbeat, extend our leases and rebalance; returns the owned shards
+    def renew(self):
+        if db is None:
+            return set(range(self.shards))
+        now = datetime.now(INDIAN_TIMEZONE)
+        expires_at = now + timedelta(seconds=self.ttl)
+        try:
+            db.scheduler_workers.update_one(
+                {'_id': self.worker_id},
+                {'$set': {
+                    'heartbeat_at': now,
+                    'expires_at': expires_at
+                }},
+                upsert=True)
+            db.scheduler_leases.update_many(
+                {
+                    'owner': self.worker_id,
+                    'expires_at': {
+                        '$gt': now
+                    }
+                }, {'$set': {
+                    'expires_at': expires_at
+                }})
+            owned = {
+                doc['_id']
+                for doc in db.scheduler_leases.find(
+                    {
+                        'owner': self.worker_id,
+                        'expires_at': {
+                            '$gt': now
+                        }
+                    }, {'_id': 1})
+            }
+            workers = db.scheduler_workers.count_documents(
+                {'expires_at': {
+                    '$gt': now
+                }})
+            share = -(-self.shards // max(workers, 1))
+
+            # Hand extra shards back so newly started workers get their share
+            for shard in sorted(owned)[share:]:
+                db.scheduler_leases.update_one(
+                    {
+                        '_id': shard,
+                        'owner': self.worker_id
+                    }, {'$set': {
+                        'owner': None,
+                        'expires_at': now
+                    }})
+                owned.discard(shard)
+
+            for shard in range(self.shards):
+                if len(owned) >= share:
+                    break
+                if shard not in owned and self._try_claim(shard, now):
+                    owned.add(shard)
+
+            self._remember(owned)
+            return owned
+        except PyMongoError as e:
+            write_log("ERROR", f"Error renewing scheduler leases: {e}")
+            return self.owned()
+
+    # Shards this worker runs for a slot: its own plus any orphaned ones.
+    # Each shard is marked with the slot atomically, so exactly one worker
+    # runs it even while leases are being handed over.
+    def claim_slot(self, slot):
+        owned = self.renew()
+        if db is None:
+            return owned
+        now = datetime.now(INDIAN_TIMEZONE)
+        claimed = set()
+        try:
+            for shard in range(self.shards):
+                if self._try_claim(shard, now, slot):
+                    claimed.add(shard)
+        except PyMongoError as e:
+            write_log("ERROR", f"Error claiming scheduler shards: {e}")
+            return set()
+        self._remember(owned | claimed)
+        return claimed
+
+    # Shards that no worker has run the slot for yet
+    def unfinished(self, slot):
+        if db is None:
+            return set()
+        try:
+            done = {
+                doc['_id']
+                for doc in db.scheduler_leases.find({'last_slot': slot},
+                                                    {'_id': 1})
+            }
+        except PyMongoError as e:
+            write_log("ERROR", f"Error reading scheduler shards: {e}")
+            return set(range(self.shards))
+        return set(range(self.shards)) - done
+
+    # Give up all leases so other workers take over without waiting
+    def release_all(self):
+        if db is None:
+            return
+        try:
+            db.scheduler_leases.update_many(
+                {'owner': self.worker_id},
+                {'$set': {
+                    'owner': None,
+                    'expires_at': datetime.now(INDIAN_TIMEZONE)
+                }})
+            db.scheduler_workers.delete_one({'_id': self.worker_id})
+        except PyMongoError as e:
+            write_log("ERROR", f"Error releasing scheduler leases: {e}")
+        self._remember(set())
+
+
+shard_leases = ShardLeaseManager(WORKER_ID, SCHEDULER_SHARDS,
+                                 SCHEDULER_LEASE_TTL)
+
+
+# Length of the delivery window, kept shorter than the gap between triggers
+def broadcast_window():
+    minutes = AUTO_UPDATE_MINUTES
+    # The last gap wraps into the next hour, so one trigger minute gives 3600
+    gaps = [(b - a) * 60
+            for a, b in zip(minutes, minutes[1:] + [minutes[0] + 60])]
+    window = min(BROADCAST_WINDOW, min(gaps) - SCHEDULER_HEARTBEAT_INTERVAL)
+    return max(window, 0)
+
+
+# Deterministic offset (seconds) of a station inside the delivery window,
+# so each station's subscribers get their update at the same time every hour
+def station_slot_offset(suffix, window):
+    if window <= 0:
+        return 0
+    return zlib.crc32(str(suffix).encode('utf-8')) % window
+
+
+# Fetch done-callback: broadcast the result and hand back the sends
+def _broadcast_when_fetched(suffix, chat_ids, handled, future):
+    deliveries = []
+    try:
+        table_data, error = future.result()
+        deliveries = broadcast_station_result(suffix, chat_ids, table_data,
+                                              error)
+    except Exception as e:
+        write_log("ERROR",
+                  f"Error in automatic update for station {suffix}: {e}")
+    handled.set_result(deliveries)
+
+
+# Housekeeping done on every scheduler wake-up
+def scheduler_heartbeat(next_run):
+    update_scheduler_state(last_tick=datetime.now(INDIAN_TIMEZONE),
+                           next_run=next_run)
+    shard_leases.renew()
+
+
+# Wait for futures in heartbeat-sized chunks so /health stays green during
+# long cycles; returns the futures that finished before the timeout
+def wait_with_heartbeat(futures, timeout=None):
+    deadline = None if timeout is None else time.monotonic() + timeout
+    done, pending = set(), set(futures)
+    while pending:
+        chunk = SCHEDULER_HEARTBEAT_INTERVAL
+        if deadline is not None:
+            chunk = min(chunk, deadline - time.monotonic())
+            if chunk <= 0:
+                break
+        finished, pending = wait_futures(pending, timeout=chunk)
+        done |= finished
+        if pending:
+            update_scheduler_state(last_tick=datetime.now(INDIAN_TIMEZONE))
+            shard_leases.renew()
+    return done
+
+
+# Push the stations of newly claimed shards onto the release heap, each at
+# its slot in the window. Every station is fetched once and fanned out to its
+# subscribers.
+def queue_shard_releases(slot, shards, window, releases, station_index):
+    claimed = {
+        suffix: chat_ids
+        for suffix, chat_ids in subscription_store.station_index().items()
+        if station_shard(suffix) in shards
+    }
+    if not claimed:
+        return
+    user_count = len({c for chats in claimed.values() for c in chats})
+    write_log(
+        "INFO",
+        f"Running automatic /rf for {len(claimed)} station(s) across {user_count} user(s) "
+        f"in shard(s) {', '.join(str(s) for s in sorted(shards))}"
+    )
+    # Another worker may have delivered these stations while it held the shard
+    load_station_fingerprints(claimed)
+    station_index.update(claimed)
+    for suffix in claimed:
+        heapq.heappush(
+            releases,
+            (slot + timedelta(seconds=station_slot_offset(suffix, window)),
+             suffix))
+
+
+# Run the automatic update for one scheduled slot
+def run_auto_update(slot):
+    try:
+        # Never run the same slot twice
+        with scheduler_state_lock:
+            if scheduler_state['last_run_slot'] == slot:
+                return
+            scheduler_state['last_run_slot'] = slot
+        auto_update_running.set()
 
+        indian_time = datetime.now(INDIAN_TIMEZONE)
+        write_log(
+            "INFO",
+            f"Running automatic /rf command for {slot.strftime('%H:%M')} IST")
+        # Shards still leased to a worker that stopped are retried until
+        # the slot is this late, by which time those leases have expired
+        claim_deadline = slot + timedelta(
+            seconds=max(SCHEDULER_MISSED_GRACE, SCHEDULER_LEASE_TTL))
+        window = broadcast_window()
+        station_index = {}
+        releases = []
+        handled = []
+        claimed_any = False
+        missing = set(range(SCHEDULER_SHARDS))
+        next_claim = time.monotonic()
+        next_heartbeat = time.monotonic()
+
+        cycle_start = time.monotonic()
+        while releases or missing:
+            now = datetime.now(INDIAN_TIMEZONE)
+            if missing and time.monotonic() >= next_claim:
+                # Only the stations in shards this worker claimed for the slot
+                shards = shard_leases.claim_slot(slot)
+                if shards:
+                    # Other processes may have changed subscriptions since
+                    # the last run
+                    if not claimed_any:
+                        if not SUBSCRIPTION_WATCH:
+                            subscription_store.refresh()
+                        # /updates may have been changed on a bot worker
+                        load_user_settings()
+                    claimed_any = True
+                    queue_shard_releases(slot, shards, window, releases,
+                                         station_index)
+                missing = shard_leases.unfinished(slot)
+                next_claim = time.monotonic() + SCHEDULER_HEARTBEAT_INTERVAL
+                if missing and now > claim_deadline:
                     write_log(
-                        "INFO",
-                        f"Running automatic /rf for user {chat_id} with {len(suffixes)} subscription(s)"
+                        "WARNING",
+                        f"Skipped shard(s) {', '.join(str(s) for s in sorted(missing))} "
+                        f"for {slot.strftime('%H:%M')} IST, still leased to another worker"
                     )
+                    missing = set()
+                continue
 
-                    for suffix in suffixes:
-                        url = f"{URL_PREFIX}{suffix}"
-                        check_proxies_and_fetch(url, chat_id, suffix=suffix)
-                        time.sleep(
-                            1)  # Small delay between multiple subscriptions
+            # Sleep until the next station is due or it is time to retry
+            # the shards nobody has run yet
+            remaining = next_claim - time.monotonic() if missing else None
+            if releases:
+                due = (releases[0][0] - now).total_seconds()
+                remaining = due if remaining is None else min(remaining, due)
+            if remaining > 0:
+                # Releases can be a second apart; heartbeat once per interval
+                if time.monotonic() >= next_heartbeat:
+                    update_scheduler_state(last_tick=now)
+                    shard_leases.renew()
+                    next_heartbeat = time.monotonic(
+                    ) + SCHEDULER_HEARTBEAT_INTERVAL
+                time.sleep(min(remaining, SCHEDULER_HEARTBEAT_INTERVAL))
+                continue
+            if not releases:
+                continue
+            release_at, suffix = heapq.heappop(releases)
+
+            # Always go upstream here; results refresh the shared cache.
+            # Subscribers are served as soon as their station's fetch is done.
+            station_handled = Future()
+            submit_station_fetch(suffix, refresh=True).add_done_callback(
+                partial(_broadcast_when_fetched, suffix,
+                        station_index[suffix], station_handled))
+            handled.append(station_handled)
+
+        if not claimed_any:
+            write_log("INFO", "No scheduler shards claimed for this slot")
+            return
+        if not station_index:
+            write_log("INFO",
+                      "No subscriptions found for automatic update")
+            return
 
-                except Exception as e:
-                    write_log(
-                        "ERROR",
-                        f"Error in automatic update for user {chat_id}: {e}")
-                    # Continue with next user even if one fails
-                    continue
+        deliveries = []
+        for station_handled in wait_with_heartbeat(handled):
+            deliveries.extend(station_handled.result())
 
-            write_log("INFO", "Completed automatic /rf command for all users")
+        # Wait for the dispatcher to work through this cycle's messages
+        done = wait_with_heartbeat(deliveries, timeout=SCHEDULER_STALE_AFTER)
+        delivered = sum(1 for f in done if f.exception() is None)
+        write_log(
+            "INFO",
+            f"Delivered {delivered}/{len(deliveries)} message(s) this cycle")
+
+        proxy_scoreboard.persist(force=True)
+        proxy_failures.flush(force=True)
+        proxy_failures.send_digest(force=True)
+        cycle_duration = time.monotonic() - cycle_start
+        scheduler_cycles.inc()
+        update_scheduler_state(last_cycle_started=indian_time,
+                               last_cycle_duration=round(cycle_duration, 1),
+                               last_cycle_stations=len(station_index))
+        cache_stats = station_cache.stats()
+        write_log(
+            "INFO",
+            f"Completed automatic /rf command for all users in {cycle_duration:.1f}s "
+            f"(cache hits: {cache_stats['hits']}, misses: {cache_stats['misses']})"
+        )
 
     except Exception as e:
-        write_log("ERROR", f"Error in check_indian_time_and_update: {e}")
+        write_log("ERROR", f"Error in automatic update: {e}")
+    finally:
+        auto_update_running.clear()
 
 
-# Run Indian time checker in a separate thread
+# Sleep until the next scheduled slot (waking for heartbeats), then run it
 def run_indian_time_checker():
-    write_log(
-        "INFO",
-        "Starting Indian time checker - checking every minute for minute 16")
+    minutes = ', '.join(f":{m:02d}" for m in AUTO_UPDATE_MINUTES)
+    write_log("INFO", f"Starting scheduler - automatic updates at {minutes} IST")
+    slot = first_auto_update_time(datetime.now(INDIAN_TIMEZONE))
     while True:
         try:
-            check_indian_time_and_update()
-            time.sleep(60)  # Check every minute
+            scheduler_heartbeat(slot)
+            remaining = (slot - datetime.now(INDIAN_TIMEZONE)).total_seconds()
+            if remaining > 0:
+                time.sleep(min(remaining, SCHEDULER_HEARTBEAT_INTERVAL))
+                continue
+
+            if -remaining > SCHEDULER_MISSED_GRACE:
+                write_log(
+                    "WARNING",
+                    f"Skipped automatic update for {slot.strftime('%H:%M')} IST, {-remaining:.0f}s late"
+                )
+            else:
+                run_auto_update(slot)
+
+            # Continue from this slot so an overrunning cycle cannot skip
+            # the next one, and jump ahead if several were missed
+            slot = next_auto_update_time(slot)
+            now = datetime.now(INDIAN_TIMEZONE)
+            while (now - slot).total_seconds() > SCHEDULER_MISSED_GRACE:
+                slot = next_auto_update_time(slot)
+        except Exception as e:
+            write_log("ERROR", f"Scheduler error: {e}")
+            time.sleep(SCHEDULER_HEARTBEAT_INTERVAL)
+
+
+# Bounded pool for command work that waits on upstream fetches, so handler
+# threads answer right away. A chat cannot queue the same command twice.
+class CommandJobQueue:
+    QUEUED = 'queued'
+    DUPLICATE = 'duplicate'
+    FULL = 'full'
+
+    def __init__(self, workers, max_jobs):
+        self.max_jobs = max_jobs
+        self._executor = ThreadPoolExecutor(max_workers=workers,
+                                            thread_name_prefix="command")
+        self._active = set()
+        self._waiting = 0
+        self._lock = threading.Lock()
+        self.stats = {
+            'started': 0,
+            'completed': 0,
+            'failed': 0,
+            'duplicates': 0,
+            'rejected': 0,
+            'total_wait': 0.0,
+            'max_wait': 0.0
+        }
+
+    # Queue fn(*args) under key; returns QUEUED, DUPLICATE or FULL
+    def submit(self, key, fn, *args):
+        with self._lock:
+            if key in self._active:
+                self.stats['duplicates'] += 1
+                return self.DUPLICATE
+            if len(self._active) >= self.max_jobs:
+                self.stats['rejected'] += 1
+                return self.FULL
+            self._active.add(key)
+            self._waiting += 1
+        self._executor.submit(self._run, key, time.monotonic(), fn, args)
+        return self.QUEUED
+
+    def _run(self, key, queued_at, fn, args):
+        wait = time.monotonic() - queued_at
+        with self._lock:
+            self._waiting -= 1
+            self.stats['started'] += 1
+            self.stats['total_wait'] += wait
+            self.stats['max_wait'] = max(self.stats['max_wait'], wait)
+        command_wait_seconds.observe(wait)
+        failed = False
+        try:
+            fn(*args)
         except Exception as e:
-            write_log("ERROR", f"Indian time checker error: {e}")
-            time.sleep(60)  # Continue running even if there's an error
+            failed = True
+            write_log("ERROR", f"Command job {key} failed: {e}")
+        finally:
+            with self._lock:
+                self._active.discard(key)
+                self.stats['failed' if failed else 'completed'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            started = self.stats['started']
+            return {
+                'queued': self._waiting,
+                'running': len(self._active) - self._waiting,
+                'completed': self.stats['completed'],
+                'failed': self.stats['failed'],
+                'duplicates': self.stats['duplicates'],
+                'rejected': self.stats['rejected'],
+                'avg_wait': round(self.stats['total_wait'] / started, 3)
+                if started else 0.0,
+                'max_wait': round(self.stats['max_wait'], 3)
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+command_jobs = CommandJobQueue(COMMAND_WORKERS, COMMAND_QUEUE_SIZE)
+
+
+# Configured proxies per circuit breaker state
+def proxy_circuit_counts():
+    counts = {(state, ): 0
+              for state in (ProxyCircuitBreaker.CLOSED, ProxyCircuitBreaker.OPEN,
+                            ProxyCircuitBreaker.HALF_OPEN)}
+    for proxy_entry in (_proxy_config or {}).get('proxies', []):
+        state, _ = proxy_breakers.state(proxy_entry)
+        counts[(state, )] += 1
+    return counts
+
+
+metrics.gauge('weather_subscribed_users', 'Chats with at least one subscription',
+              callback=lambda: subscription_store.counts()[0])
+metrics.gauge('weather_subscribed_stations', 'Stations with at least one subscriber',
+              callback=lambda: subscription_store.counts()[1])
+metrics.gauge('weather_proxy_circuits', 'Configured proxies by circuit state',
+              ('state', ), callback=proxy_circuit_counts)
+metrics.gauge('weather_scheduler_last_cycle_seconds',
+              'Duration of the last automatic update cycle',
+              callback=lambda: get_scheduler_state()['last_cycle_duration'] or 0)
+metrics.gauge('weather_scheduler_last_cycle_stations',
+              'Stations handled in the last automatic update cycle',
+              callback=lambda: get_scheduler_state()['last_cycle_stations'])
+metrics.gauge('weather_telegram_queue_depth', 'Messages waiting to be sent',
+              callback=telegram_dispatcher.pending)
+metrics.gauge('weather_command_queue_depth', 'Command jobs waiting for a worker',
+              callback=lambda: command_jobs.snapshot()['queued'])
+metrics.gauge('weather_station_cache_entries', 'Cached station readings',
+              callback=lambda: station_cache.stats()['size'])
+metrics.gauge('weather_log_queue_depth', 'Log records waiting to be written',
+              callback=lambda: log_pipeline_stats()['queued'])
+metrics.gauge('weather_log_records_dropped', 'Log records dropped on a full queue',
+              callback=lambda: log_pipeline_stats()['dropped'])
+
+
+# Queue a command job for a chat and tell the user if it was not accepted
+def queue_command_job(chat_id, message_id, command, fn, *args):
+    status = command_jobs.submit((chat_id, command), fn, *args)
+    if status == CommandJobQueue.DUPLICATE:
+        bot.edit_message_text(
+            f"⏳ Your previous <code>/{escape_html(command)}</code> is still running.",
+            chat_id,
+            message_id,
+            parse_mode='HTML')
+    elif status == CommandJobQueue.FULL:
+        write_log("WARNING", f"Command queue full, rejected /{command} from {chat_id}")
+        bot.edit_message_text(
+            "⏳ The bot is busy right now. Please try again in a minute.",
+            chat_id, message_id)
+    return status
 
 
 # Command: /start with error handling
@@ -744,10 +3140,12 @@ def send_welcome(message):
 • <code>/list</code> - View your subscriptions
 • <code>/unsubscribe &lt;number&gt;</code> - Remove a subscription
 • <code>/rf</code> - Get latest weather data (manual refresh)
+• <code>/updates all|changed</code> - Hourly updates always, or only when the reading changes
 • <code>/logs</code> - View logs (owner only)
 
 <b>Proxy Management (Owner Only):</b>
 • <code>/proxy_list</code> - View all proxies
+• <code>/status</code> - Scheduler and cache status
 • <code>/update_proxy ip:port:protocol</code> - Add new proxy
 • <code>/delete_proxy ip:port:protocol</code> - Remove proxy
 
@@ -758,7 +3156,7 @@ def send_welcome(message):
 
 <b>Limits:</b> Maximum {MAX_SUBSCRIPTIONS_PER_USER} subscriptions per user.
 
-You'll receive automatic updates every hour at 16 minutes past the hour (Indian time).
+You'll receive automatic updates every hour at {', '.join(str(m) for m in AUTO_UPDATE_MINUTES)} minutes past the hour (Indian time), each station at a fixed time within {broadcast_window() // 60} minutes of that.
         """
         bot.reply_to(message, welcome_msg, parse_mode='HTML')
     except Exception as e:
@@ -789,17 +3187,10 @@ def subscribe(message):
                 parse_mode='HTML')
             return
 
-        subscriptions = load_subscriptions()
-
-        # Initialize user subscriptions if not exists
-        if chat_id not in subscriptions:
-            subscriptions[chat_id] = []
-        elif isinstance(subscriptions[chat_id], str):
-            # Convert old format to new format
-            subscriptions[chat_id] = [subscriptions[chat_id]]
+        user_subs = subscription_store.get(chat_id)
 
         # Check subscription limit
-        if len(subscriptions[chat_id]) >= MAX_SUBSCRIPTIONS_PER_USER:
+        if len(user_subs) >= MAX_SUBSCRIPTIONS_PER_USER:
             bot.reply_to(
                 message,
                 f"❌ <b>Subscription limit reached!</b>\n\nYou can have maximum {MAX_SUBSCRIPTIONS_PER_USER} subscriptions.\n\nUse <code>/list</code> to view current subscriptions or <code>/unsubscribe &lt;number&gt;</code> to remove one.",
@@ -807,58 +3198,48 @@ def subscribe(message):
             return
 
         # Check if already subscribed to this suffix
-        if suffix in subscriptions[chat_id]:
+        if suffix in user_subs:
             bot.reply_to(
                 message,
                 f"❌ You are already subscribed to station <b>{suffix}</b>.\n\nUse <code>/list</code> to view all subscriptions.",
                 parse_mode='HTML')
             return
 
-        url = f"{URL_PREFIX}{suffix}"
-
-        # Send validation message
+        # Send validation message; the network work runs as a job
         val_msg = bot.reply_to(message,
                                f"🔄 <b>Validating station ID {suffix}...</b>",
                                parse_mode='HTML')
+        queue_command_job(chat_id, val_msg.message_id, f"subscribe {suffix}",
+                          subscribe_job, chat_id, suffix, val_msg.message_id)
 
-        # Validate station before subscribing
-        proxies_data = load_proxies()
-        validation_success = False
-        validation_error = None
+    except Exception as e:
+        write_log("ERROR",
+                  f"Error in /subscribe command for user {chat_id}: {e}")
+        try:
+            bot.reply_to(
+                message,
+                "❌ Error occurred during subscription. Please try again.")
+        except:
+            pass
 
-        # Try with proxies first
-        if proxies_data and "proxies" in proxies_data and proxies_data[
-                "proxies"]:
-            for proxy_entry in proxies_data["proxies"]:
-                try:
-                    if ':' not in proxy_entry:
-                        continue
-                    proxy, scheme = proxy_entry.rsplit(':', 1)
-                    table_data, error = fetch_table_data(url, proxy, scheme)
-
-                    if table_data:
-                        validation_success = True
-                        break
-                    elif error and "Invalid station ID" in error:
-                        validation_error = error
-                        break
-                except:
-                    continue
 
-        # Try direct request if proxies failed
-        if not validation_success and not validation_error:
-            table_data, error = fetch_table_data_direct(url)
-            if table_data:
-                validation_success = True
-            elif error and "Invalid station ID" in error:
-                validation_error = error
+# Validate a station, subscribe and show its data, editing the ack message
+def subscribe_job(chat_id, suffix, message_id):
+    try:
+        url = f"{URL_PREFIX}{suffix}"
+
+        # Validate station before subscribing; a successful fetch is cached
+        # and reused for the initial data below
+        table_data, error = get_station_data(suffix)
+        validation_success = bool(table_data)
+        validation_error = error if not table_data else None
 
         # Handle validation results
         if validation_error and "Invalid station ID" in validation_error:
             bot.edit_message_text(
                 f"❌ <b>Invalid station ID!</b>\n\n📡 <b>Station ID:</b> {suffix}\n\n❗ This station does not exist. Please check the station ID and try again.",
                 chat_id,
-                val_msg.message_id,
+                message_id,
                 parse_mode='HTML')
             return
 
@@ -866,35 +3247,48 @@ def subscribe(message):
             bot.edit_message_text(
                 f"⚠️ <b>Unable to validate station</b>\n\n📡 <b>Station ID:</b> {suffix}\n\n🔄 Network issues detected. You can try subscribing again later.",
                 chat_id,
-                val_msg.message_id,
+                message_id,
                 parse_mode='HTML')
             return
 
         # Add subscription only after successful validation
-        subscriptions[chat_id].append(suffix)
-        save_subscriptions(subscriptions)
+        status, suffixes = subscription_store.add(chat_id, suffix)
+        if status == "limit":
+            bot.edit_message_text(
+                f"❌ <b>Subscription limit reached!</b>\n\nYou can have maximum {MAX_SUBSCRIPTIONS_PER_USER} subscriptions.\n\nUse <code>/list</code> to view current subscriptions or <code>/unsubscribe &lt;number&gt;</code> to remove one.",
+                chat_id,
+                message_id,
+                parse_mode='HTML')
+            return
+        if status == "exists":
+            bot.edit_message_text(
+                f"❌ You are already subscribed to station <b>{suffix}</b>.\n\nUse <code>/list</code> to view all subscriptions.",
+                chat_id,
+                message_id,
+                parse_mode='HTML')
+            return
         write_log("INFO", f"{chat_id} subscribed to suffix {suffix}")
 
         # Update message with success and show data
         bot.edit_message_text(
-            f"✅ <b>Successfully subscribed!</b>\n\n📡 <b>Station ID:</b> {suffix}\n📊 <b>Total subscriptions:</b> {len(subscriptions[chat_id])}/{MAX_SUBSCRIPTIONS_PER_USER}\n🔄 Fetching initial data...",
+            f"✅ <b>Successfully subscribed!</b>\n\n📡 <b>Station ID:</b> {suffix}\n📊 <b>Total subscriptions:</b> {len(suffixes)}/{MAX_SUBSCRIPTIONS_PER_USER}\n🔄 Fetching initial data...",
             chat_id,
-            val_msg.message_id,
+            message_id,
             parse_mode='HTML')
 
         # Fetch and display initial data
         check_proxies_and_fetch(url,
                                 chat_id,
-                                val_msg.message_id,
+                                message_id,
                                 suffix=suffix)
 
     except Exception as e:
         write_log("ERROR",
                   f"Error in /subscribe command for user {chat_id}: {e}")
         try:
-            bot.reply_to(
-                message,
-                "❌ Error occurred during subscription. Please try again.")
+            bot.edit_message_text(
+                "❌ Error occurred during subscription. Please try again.",
+                chat_id, message_id)
         except:
             pass
 
@@ -904,19 +3298,15 @@ def subscribe(message):
 def list_subscriptions(message):
     chat_id = str(message.chat.id)
     try:
-        subscriptions = load_subscriptions()
+        user_subs = subscription_store.get(chat_id)
 
-        if chat_id not in subscriptions or not subscriptions[chat_id]:
+        if not user_subs:
             bot.reply_to(
                 message,
                 "📋 <b>No active subscriptions</b>\n\nUse <code>/subscribe &lt;number&gt;</code> to subscribe to a weather station.",
                 parse_mode='HTML')
             return
 
-        user_subs = subscriptions[chat_id]
-        if isinstance(user_subs, str):
-            user_subs = [user_subs]
-
         msg = f"📋 <b>Your Subscriptions ({len(user_subs)}/{MAX_SUBSCRIPTIONS_PER_USER})</b>\n\n"
         for i, suffix in enumerate(user_subs, 1):
             msg += f"{i}. Station <code>{suffix}</code>\n"
@@ -954,40 +3344,25 @@ def unsubscribe(message):
                 parse_mode='HTML')
             return
 
-        subscriptions = load_subscriptions()
-
-        if chat_id not in subscriptions or not subscriptions[chat_id]:
+        if not subscription_store.get(chat_id):
             bot.reply_to(
                 message,
                 "❌ You have no active subscriptions.\n\nUse <code>/subscribe &lt;number&gt;</code> to subscribe first.",
                 parse_mode='HTML')
             return
 
-        user_subs = subscriptions[chat_id]
-        if isinstance(user_subs, str):
-            user_subs = [user_subs]
-            subscriptions[chat_id] = user_subs
-
-        if suffix not in user_subs:
+        # Remove subscription; None means it was not there
+        user_subs = subscription_store.remove(chat_id, suffix)
+        if user_subs is None:
             bot.reply_to(
                 message,
                 f"❌ You are not subscribed to station <b>{suffix}</b>.\n\nUse <code>/list</code> to view your subscriptions.",
                 parse_mode='HTML')
             return
 
-        # Remove subscription
-        user_subs.remove(suffix)
-
-        # Clean up empty subscription lists
-        if not user_subs:
-            del subscriptions[chat_id]
-        else:
-            subscriptions[chat_id] = user_subs
-
-        save_subscriptions(subscriptions)
         write_log("INFO", f"{chat_id} unsubscribed from suffix {suffix}")
 
-        remaining = len(user_subs) if user_subs else 0
+        remaining = len(user_subs)
         bot.reply_to(
             message,
             f"✅ <b>Successfully unsubscribed!</b>\n\n📡 <b>Removed station:</b> {suffix}\n📊 <b>Remaining subscriptions:</b> {remaining}/{MAX_SUBSCRIPTIONS_PER_USER}",
@@ -1009,34 +3384,16 @@ def unsubscribe(message):
 def manual_fetch(message):
     chat_id = str(message.chat.id)
     try:
-        subscriptions = load_subscriptions()
-        if chat_id in subscriptions and subscriptions[chat_id]:
-            user_subs = subscriptions[chat_id]
-            if isinstance(user_subs, str):
-                user_subs = [user_subs]
-
-            # Send acknowledgment first
+        user_subs = subscription_store.get(chat_id)
+        if user_subs:
+            # Send acknowledgment first; the fetches run as a job
             ack_msg = bot.reply_to(
                 message,
                 f"🔄 Fetching latest weather data for {len(user_subs)} station(s)..."
             )
-
-            for i, suffix in enumerate(user_subs):
-                url = f"{URL_PREFIX}{suffix}"
-                if i == 0:
-                    # Edit the first message
-                    check_proxies_and_fetch(url,
-                                            chat_id,
-                                            ack_msg.message_id,
-                                            is_manual=True,
-                                            suffix=suffix)
-                else:
-                    # Send new messages for additional subscriptions
-                    check_proxies_and_fetch(url,
-                                            chat_id,
-                                            is_manual=False,
-                                            suffix=suffix)
-                    time.sleep(1)  # Small delay between requests
+            queue_command_job(chat_id, ack_msg.message_id, "rf",
+                              manual_fetch_job, chat_id, user_subs,
+                              ack_msg.message_id)
         else:
             bot.reply_to(
                 message,
@@ -1052,6 +3409,80 @@ def manual_fetch(message):
             pass
 
 
+# Fetch a chat's stations and post them, the first one into the ack message
+def manual_fetch_job(chat_id, user_subs, message_id):
+    try:
+        # Start every station at once and render each from its own future
+        futures = [
+            submit_station_fetch(suffix, hedge=HEDGED_MANUAL_FETCH)
+            for suffix in user_subs
+        ]
+
+        for i, (suffix, future) in enumerate(zip(user_subs, futures)):
+            url = f"{URL_PREFIX}{suffix}"
+            if i == 0:
+                # Edit the first message
+                check_proxies_and_fetch(url,
+                                        chat_id,
+                                        message_id,
+                                        is_manual=True,
+                                        suffix=suffix,
+                                        hedge=HEDGED_MANUAL_FETCH,
+                                        future=future)
+            else:
+                # Send new messages for additional subscriptions
+                check_proxies_and_fetch(url,
+                                        chat_id,
+                                        is_manual=False,
+                                        suffix=suffix,
+                                        hedge=HEDGED_MANUAL_FETCH,
+                                        future=future)
+    except Exception as e:
+        write_log("ERROR", f"Error in /rf command for user {chat_id}: {e}")
+        try:
+            bot.edit_message_text(
+                "❌ Error occurred while fetching data. Please try again.",
+                chat_id, message_id)
+        except:
+            pass
+
+
+# Command: /updates all|changed - Choose when hourly updates are sent
+@bot.message_handler(commands=['updates'])
+def set_update_mode(message):
+    chat_id = str(message.chat.id)
+    try:
+        try:
+            mode = message.text.split()[1].lower()
+        except IndexError:
+            mode = None
+
+        if mode not in ('all', 'changed'):
+            current = 'changed' if chat_id in only_changed_chats else 'all'
+            bot.reply_to(
+                message,
+                f"⚙️ <b>Current update mode:</b> {current}\n\n<b>Usage:</b>\n• <code>/updates all</code> - Send every hourly update\n• <code>/updates changed</code> - Only send when the reading changed",
+                parse_mode='HTML')
+            return
+
+        save_only_changed(chat_id, mode == 'changed')
+        write_log("INFO", f"{chat_id} set update mode to {mode}")
+
+        if mode == 'changed':
+            reply = "✅ You'll only receive hourly updates when a station's reading has changed."
+        else:
+            reply = "✅ You'll receive every hourly update."
+        bot.reply_to(message, reply)
+
+    except Exception as e:
+        write_log("ERROR",
+                  f"Error in /updates command for user {chat_id}: {e}")
+        try:
+            bot.reply_to(message, "❌ Error occurred. Please try again.")
+        except:
+            pass
+
+
 # Command: /logs with error handling
 @bot.message_handler(commands=['logs'])
 def send_logs(message):
@@ -1059,8 +3490,12 @@ def send_logs(message):
         if str(message.chat.id) == OWNER_ID:
             if os.path.exists(LOG_FILE):
                 try:
-                    with open(LOG_FILE, 'rb') as f:
-                        bot.send_document(message.chat.id, f)
+                    # Include the previous segment so a fresh rotation
+                    # does not hide recent history
+                    for path in (f"{LOG_FILE}.1", LOG_FILE):
+                        if os.path.exists(path):
+                            with open(path, 'rb') as f:
+                                bot.send_document(message.chat.id, f)
                 except Exception as e:
                     write_log("ERROR", f"Error sending log file: {e}")
                     bot.reply_to(message, "❌ Error sending log file.")
@@ -1076,6 +3511,50 @@ def send_logs(message):
             pass
 
 
+# Command: /status - Scheduler heartbeat and cache stats (owner only)
+@bot.message_handler(commands=['status'])
+def send_status(message):
+    try:
+        if str(message.chat.id) != OWNER_ID:
+            bot.reply_to(message, "❌ Only the owner can view the status.")
+            return
+
+        status = health_status()
+        scheduler = get_scheduler_state()
+        cache = status['station_cache']
+
+        def fmt(value):
+            return value.strftime('%Y-%m-%d %H:%M:%S IST') if value else 'never'
+
+        duration = scheduler['last_cycle_duration']
+        msg = "📈 <b>Bot Status</b>\n\n"
+        msg += f"{'✅' if status['healthy'] else '⚠️'} <b>Scheduler:</b> {'healthy' if status['healthy'] else 'stale'}\n"
+        msg += f"🕐 <b>Last tick:</b> {fmt(scheduler['last_tick'])}\n"
+        msg += f"⏭️ <b>Next run:</b> {fmt(scheduler['next_run'])}\n"
+        msg += f"🔁 <b>Last cycle:</b> {fmt(scheduler['last_cycle_started'])}"
+        if duration is not None:
+            msg += f" ({duration}s, {scheduler['last_cycle_stations']} station(s))"
+        msg += "\n"
+        worker = status['worker']
+        msg += f"🧩 <b>Worker:</b> <code>{escape_html(worker['id'])}</code> ({worker['role']}), shards {', '.join(str(s) for s in worker['shards']) or 'none'} of {worker['shard_count']}\n\n"
+        msg += f"🗄️ <b>Station cache:</b> {cache['size']} entries, {cache['hits']} hits, {cache['misses']} misses\n"
+        telegram = status['telegram']
+        msg += f"📨 <b>Telegram:</b> {telegram['sent']} sent, {telegram['failed']} failed, {telegram['retried']} retried, {telegram['pending']} queued\n"
+        commands = status['commands']
+        msg += f"⚙️ <b>Command jobs:</b> {commands['queued']} queued, {commands['running']} running, {commands['completed']} done, wait avg {commands['avg_wait']}s / max {commands['max_wait']}s\n"
+        log_pipeline = status['log_pipeline']
+        msg += f"📝 <b>Log writer:</b> {log_pipeline['queued']} queued, {log_pipeline['dropped']} dropped\n"
+
+        bot.reply_to(message, msg, parse_mode='HTML')
+
+    except Exception as e:
+        write_log("ERROR", f"Error in /status command: {e}")
+        try:
+            bot.reply_to(message, "❌ Error occurred. Please try again.")
+        except:
+            pass
+
+
 # Command: /update_proxy - Add new proxy (owner only)
 @bot.message_handler(commands=['update_proxy'])
 def update_proxy(message):
@@ -1125,24 +3604,46 @@ def update_proxy(message):
                 parse_mode='HTML')
             return
 
-        # Remove from failed list if it exists there
-        if proxy_entry in proxies_data.get("failed", []):
-            proxies_data["failed"].remove(proxy_entry)
+        # Probe the proxy before accepting it
+        probe_msg = bot.reply_to(
+            message,
+            f"🔄 <b>Checking proxy</b> <code>{proxy_entry}</code>...",
+            parse_mode='HTML')
+        probe = probe_proxies([proxy_entry],
+                              track_failures=False)[proxy_entry]
+        if not probe['success']:
+            bot.edit_message_text(
+                f"❌ <b>Proxy health check failed!</b>\n\n📡 <b>Proxy:</b> <code>{proxy_entry}</code>\n❗ <b>Error:</b> {escape_html(str(probe['error']))}",
+                message.chat.id,
+                probe_msg.message_id,
+                parse_mode='HTML')
+            return
+
+        # Add to active proxies list and remove from failed list
+        was_failed = proxy_entry in proxies_data.get("failed", [])
+        proxies_data = update_proxy_config({
+            '$addToSet': {
+                'proxies': proxy_entry
+            },
+            '$pull': {
+                'failed': proxy_entry
+            }
+        })
+        if proxies_data is None:
+            bot.edit_message_text(
+                "❌ Error occurred while adding proxy. Please try again.",
+                message.chat.id, probe_msg.message_id)
+            return
+        if was_failed:
             write_log("INFO",
                       f"Removed {proxy_entry} from failed proxies list")
 
-        # Add to active proxies list
-        if "proxies" not in proxies_data:
-            proxies_data["proxies"] = []
-
-        proxies_data["proxies"].append(proxy_entry)
-        save_proxies(proxies_data)
-
         write_log("INFO", f"Owner added new proxy: {proxy_entry}")
 
-        bot.reply_to(
-            message,
-            f"✅ <b>Proxy added successfully!</b>\n\n📡 <b>Proxy:</b> <code>{ip}:{port}</code>\n🔗 <b>Protocol:</b> {protocol.upper()}\n📊 <b>Total proxies:</b> {len(proxies_data['proxies'])}",
+        bot.edit_message_text(
+            f"✅ <b>Proxy added successfully!</b>\n\n📡 <b>Proxy:</b> <code>{ip}:{port}</code>\n🔗 <b>Protocol:</b> {protocol.upper()}\n⏱️ <b>Probe:</b> connect {probe['connect_time']:.2f}s, total {probe['total_time']:.2f}s\n📊 <b>Total proxies:</b> {len(proxies_data['proxies'])}",
+            message.chat.id,
+            probe_msg.message_id,
             parse_mode='HTML')
 
     except Exception as e:
@@ -1178,8 +3679,12 @@ def delete_proxy(message):
 
         # Check if proxy exists in active list
         if proxy_entry in proxies_data.get("proxies", []):
-            proxies_data["proxies"].remove(proxy_entry)
-            save_proxies(proxies_data)
+            proxies_data = update_proxy_config(
+                {'$pull': {
+                    'proxies': proxy_entry
+                }})
+            if proxies_data is None:
+                raise RuntimeError("proxy configuration update failed")
             write_log("INFO", f"Owner deleted proxy: {proxy_entry}")
 
             bot.reply_to(
@@ -1190,8 +3695,10 @@ def delete_proxy(message):
 
         # Check if proxy exists in failed list
         if proxy_entry in proxies_data.get("failed", []):
-            proxies_data["failed"].remove(proxy_entry)
-            save_proxies(proxies_data)
+            if update_proxy_config({'$pull': {
+                    'failed': proxy_entry
+            }}) is None:
+                raise RuntimeError("proxy configuration update failed")
             write_log("INFO", f"Owner deleted failed proxy: {proxy_entry}")
 
             bot.reply_to(
@@ -1236,7 +3743,14 @@ def proxy_list(message):
             for i, proxy in enumerate(active_proxies, 1):
                 try:
                     ip_port, protocol = proxy.rsplit(':', 1)
-                    msg += f"{i}. <code>{ip_port}</code> ({protocol.upper()})\n"
+                    state, retry_in = proxy_breakers.state(proxy)
+                    if state == ProxyCircuitBreaker.OPEN:
+                        circuit = f"🔴 open, retry in {retry_in}s"
+                    elif state == ProxyCircuitBreaker.HALF_OPEN:
+                        circuit = "🟡 half-open"
+                    else:
+                        circuit = "🟢 closed"
+                    msg += f"{i}. <code>{ip_port}</code> ({protocol.upper()}) - {circuit}{probe_summary(proxy)}\n"
                 except:
                     msg += f"{i}. <code>{proxy}</code> (Invalid format)\n"
         else:
@@ -1250,7 +3764,7 @@ def proxy_list(message):
             for i, proxy in enumerate(failed_proxies, 1):
                 try:
                     ip_port, protocol = proxy.rsplit(':', 1)
-                    msg += f"{i}. <code>{ip_port}</code> ({protocol.upper()})\n"
+                    msg += f"{i}. <code>{ip_port}</code> ({protocol.upper()}){probe_summary(proxy)}\n"
                 except:
                     msg += f"{i}. <code>{proxy}</code> (Invalid format)\n"
         else:
@@ -1271,11 +3785,60 @@ def proxy_list(message):
             pass
 
 
+# Webhook mode: updates posted to the web server are handled on this pool
+webhook_executor = ThreadPoolExecutor(max_workers=WEBHOOK_WORKERS,
+                                      thread_name_prefix="webhook")
+
+
+def process_update(update):
+    try:
+        bot.process_new_updates([update])
+    except Exception as e:
+        write_log("ERROR", f"Error processing update {update.update_id}: {e}")
+
+
+# Decode a webhook body and hand it to the handlers without blocking the
+# web server, so Telegram gets its response right away
+def handle_webhook_update(body):
+    try:
+        update = telebot.types.Update.de_json(body)
+    except Exception as e:
+        write_log("ERROR", f"Invalid webhook update: {e}")
+        return
+    webhook_executor.submit(process_update, update)
+
+
+# Register the webhook with Telegram, retrying until it succeeds, then idle
+def start_webhook():
+    register_webhook_handler(handle_webhook_update, WEBHOOK_SECRET)
+    url = f"{WEBHOOK_URL.rstrip('/')}/webhook/{WEBHOOK_SECRET}"
+    while True:
+        try:
+            bot.remove_webhook()
+            bot.set_webhook(url=url, secret_token=WEBHOOK_SECRET)
+            write_log("INFO", f"Webhook registered at {WEBHOOK_URL}")
+            break
+        except Exception as e:
+            write_log("CRITICAL", f"Webhook registration failed: {e}")
+            print(f"Webhook registration error: {e}")
+            print("Retrying in 5 seconds...")
+            time.sleep(5)
+
+    # Updates arrive on the web server threads from here on
+    while True:
+        time.sleep(3600)
+
+
 # Start the bot with infinite polling and comprehensive error handling
 def start_bot():
+    if BOT_MODE == 'webhook':
+        start_webhook()
+        return
     while True:
         try:
             write_log("INFO", "Starting bot polling...")
+            # A webhook left from BOT_MODE=webhook makes getUpdates fail
+            bot.remove_webhook()
             bot.polling(none_stop=True, interval=1, timeout=20)
         except Exception as e:
             write_log("CRITICAL", f"Bot polling crashed: {e}")
@@ -1285,8 +3848,15 @@ def start_bot():
             continue
 
 
+# Exit through the cleanup in __main__ on SIGTERM, so the scheduler leases
+# are released instead of blocking other workers until they expire
+def handle_sigterm(signum, frame):
+    raise SystemExit(0)
+
+
 # Start the bot
 if __name__ == "__main__":
+    signal.signal(signal.SIGTERM, handle_sigterm)
     try:
         # Initialize MongoDB connection
         if not init_mongodb():
@@ -1294,10 +3864,41 @@ if __name__ == "__main__":
             print("Failed to connect to MongoDB. Please check your MONGO_URI environment variable.")
             exit(1)
         
-        # Start Indian time checker in a background thread
-        threading.Thread(target=run_indian_time_checker, daemon=True).start()
-        write_log("INFO", "Bot started successfully")
-        start_bot()
+        if not prepare_subscriptions_collection():
+            write_log("CRITICAL",
+                      "Subscriptions collection is not ready. Exiting...")
+            print("Failed to prepare the subscriptions collection. Check the logs for details.")
+            exit(1)
+        subscription_store.load()
+        if SUBSCRIPTION_WATCH:
+            threading.Thread(target=watch_subscription_changes,
+                             daemon=True).start()
+        proxy_scoreboard.load()
+        load_station_fingerprints()
+        load_user_settings()
+
+        # Serve the health endpoint from the keep-alive web server
+        register_health_provider(health_status)
+        keep_alive(WEB_PORT)
+
+        threading.Thread(target=run_proxy_failure_flusher,
+                         daemon=True).start()
+        if PROXY_PROBE_INTERVAL > 0:
+            threading.Thread(target=run_proxy_prober, daemon=True).start()
+
+        write_log("INFO",
+                  f"Bot started successfully as worker {WORKER_ID} ({WORKER_ROLE})")
+        if WORKER_ROLE == 'bot':
+            start_bot()
+        else:
+            shard_leases.prepare()
+            if WORKER_ROLE == 'scheduler':
+                run_indian_time_checker()
+            else:
+                # Start Indian time checker in a background thread
+                threading.Thread(target=run_indian_time_checker,
+                                 daemon=True).start()
+                start_bot()
     except KeyboardInterrupt:
         write_log("INFO", "Bot stopped by user")
         print("Bot stopped by user")
@@ -1306,7 +3907,24 @@ if __name__ == "__main__":
         print(f"Fatal error: {e}")
         print("Bot will restart automatically...")
     finally:
+        if WORKER_ROLE != 'bot':
+            shard_leases.release_all()
+
+        webhook_executor.shutdown(wait=False)
+        command_jobs.shutdown()
+
+        # Persist pending proxy failures and send the last digest
+        proxy_failures.flush(force=True)
+        proxy_failures.send_digest(force=True)
+
+        # Deliver messages that are still queued
+        telegram_dispatcher.stop()
+        session_pool.close_all()
+
         # Close MongoDB connection
         if mongo_client:
             mongo_client.close()
             write_log("INFO", "MongoDB connection closed")
+
+        # Flush buffered log records before exiting
+        stop_log_writer()
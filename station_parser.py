@@ -0,0 +1,117 @@
+import hashlib
+import re
+
+# Error returned when the upstream page reports an unknown station
+INVALID_STATION_ERROR = "Invalid station ID - station does not exist"
+TABLE_NOT_FOUND_ERROR = "Table not found in HTML"
+
+# Keys that are never shown to users
+SKIPPED_KEYS = ('latitude', 'longitude')
+
+# One tokenizer pass over the table: row starts, row ends and whole cells
+_TOKEN_RE = re.compile(r'<tr>|</tr>|<td>([^<]*(?:<(?!/td>)[^<]*)*)</td>')
+_TAG_RE = re.compile(r'<[^>]*>')
+
+
+# Remove every HTML tag from a cell in a single linear pass
+def strip_tags(text):
+    return _TAG_RE.sub('', text).strip()
+
+
+# Return the first <table>...</table> block of a page, or None
+def extract_table(html):
+    table_start = html.find('<table')
+    if table_start == -1:
+        return None
+    table_end = html.find('</table>', table_start)
+    if table_end == -1:
+        return None
+    return html[table_start:table_end + len('</table>')]
+
+
+# Yield (key, value) pairs from the rows of a station table
+def iter_table_rows(table_html):
+    cells = None
+    for match in _TOKEN_RE.finditer(table_html):
+        token = match.group(0)
+        if token == '<tr>':
+            cells = []
+        elif token == '</tr>':
+            if cells is not None and len(cells) >= 2:
+                key = strip_tags(cells[0])
+                if key.lower() not in SKIPPED_KEYS:
+                    yield key, strip_tags(cells[1])
+            cells = None
+        elif cells is not None:
+            cells.append(match.group(1))
+
+
+# Parse a station page into table data, returning (table_data, error)
+def parse_station_html(html):
+    if "Invalid Range" in html:
+        return None, INVALID_STATION_ERROR
+
+    table_html = extract_table(html)
+    if table_html is None:
+        return None, TABLE_NOT_FOUND_ERROR
+
+    return list(iter_table_rows(table_html)), None
+
+
+# Incrementally buffer a station page and stop once the first table closes
+class StationPageReader:
+
+    def __init__(self):
+        self.buffer = ''
+        self.invalid = False
+        self.complete = False
+        self._table_start = -1
+        self._table_end = -1
+
+    # Feed decoded text; returns True once no more input is needed
+    def feed(self, text):
+        if self.complete or not text:
+            return self.complete
+        scanned = len(self.buffer)
+        self.buffer += text
+
+        # Re-scan only the new text plus enough overlap for split markers
+        if self.buffer.find("Invalid Range",
+                            max(0, scanned - len("Invalid Range") + 1)) != -1:
+            self.invalid = True
+            self.complete = True
+            return True
+
+        if self._table_start == -1:
+            self._table_start = self.buffer.find(
+                '<table', max(0, scanned - len('<table') + 1))
+            if self._table_start == -1:
+                return False
+
+        table_end = self.buffer.find(
+            '</table>',
+            max(self._table_start, scanned - len('</table>') + 1))
+        if table_end != -1:
+            self._table_end = table_end + len('</table>')
+            self.complete = True
+        return self.complete
+
+    # Parse what has been read so far, returning (table_data, error)
+    def result(self):
+        if self.invalid:
+            return None, INVALID_STATION_ERROR
+        if self._table_end == -1:
+            return None, TABLE_NOT_FOUND_ERROR
+        table_html = self.buffer[self._table_start:self._table_end]
+        return list(iter_table_rows(table_html)), None
+
+
+# Stable content hash of parsed table data, ignoring whitespace differences
+def table_fingerprint(table_data):
+    digest = hashlib.sha1()
+    for key, value in table_data:
+        digest.update(' '.join(str(key).split()).encode('utf-8'))
+        digest.update(b'\x1f')
+        digest.update(' '.join(str(value).split()).encode('utf-8'))
+        digest.update(b'\x1e')
+    return digest.hexdigest()
@@ -1,15 +1,69 @@
-from flask import Flask
+import hmac
+from flask import Flask, Response, jsonify, request, abort
 from threading import Thread
+import metrics
 
 app = Flask(__name__)
 
+# Callables returning a dict that is merged into the /health response.
+# A provider reporting "healthy": False turns the response into a 503.
+health_providers = []
+
+def register_health_provider(provider):
+    health_providers.append(provider)
+
+# Telegram webhook: the handler gets the raw JSON body of each update. The
+# secret is both the URL path and Telegram's secret token header.
+webhook = {"handler": None, "secret": None}
+
+def register_webhook_handler(handler, secret):
+    webhook["handler"] = handler
+    webhook["secret"] = secret
+
 @app.route('/')
 def home():
     return "I'm alive"
 
-def run():
-    app.run(host='0.0.0.0', port=3026)
+@app.route('/health')
+def health():
+    status = {}
+    healthy = True
+    for provider in health_providers:
+        try:
+            result = provider()
+        except Exception as e:
+            result = {"healthy": False, "error": str(e)}
+        healthy = healthy and result.get("healthy", True)
+        status.update(result)
+    status["healthy"] = healthy
+    return jsonify(status), 200 if healthy else 503
+
+@app.route('/metrics')
+def prometheus_metrics():
+    return Response(metrics.render(),
+                    content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/webhook/<secret>', methods=['POST'])
+def telegram_webhook(secret):
+    expected = webhook["secret"]
+    # Compare bytes: compare_digest rejects non-ASCII str arguments
+    if webhook["handler"] is None or not hmac.compare_digest(
+            secret.encode(), expected.encode()):
+        abort(404)
+    header = request.headers.get('X-Telegram-Bot-Api-Secret-Token', '')
+    if not hmac.compare_digest(header.encode(), expected.encode()):
+        abort(403)
+    webhook["handler"](request.get_data(as_text=True))
+    return '', 200
+
+def run(port):
+    try:
+        app.run(host='0.0.0.0', port=port)
+    except (OSError, SystemExit) as e:
+        # Usually another worker on this host already uses the port; werkzeug
+        # exits instead of raising in that case
+        print(f"Web server could not listen on port {port}: {e}")
 
-def keep_alive():
-    t = Thread(target=run)
+def keep_alive(port=3026):
+    t = Thread(target=run, args=(port,), daemon=True)
     t.start()